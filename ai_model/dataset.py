@@ -1,40 +1,151 @@
 import os
+import numpy as np
 import torch
 from PIL import Image
 
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+INDEX_FILE = ".index.npz"
+
+
+def _dir_key(*dirs):
+    # Adding, removing or renaming files bumps the directory mtime
+    return np.array([os.stat(d).st_mtime_ns for d in dirs], dtype=np.int64)
+
+
+def build_index(img_dir, ann_dir):
+    """
+    Parse every annotation once into packed arrays:
+        boxes   float32 (M, 4)   all boxes, image after image
+        labels  int64   (M,)
+        offsets int64   (N + 1,) boxes of image i are boxes[offsets[i]:offsets[i + 1]]
+        sizes   int32   (N, 2)   (width, height), read from image headers only
+    """
+    names = sorted(n for n in os.listdir(img_dir) if n.lower().endswith(IMAGE_EXTS))
+    ann_files = set(os.listdir(ann_dir)) if os.path.isdir(ann_dir) else set()
+
+    boxes, labels = [], []
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    sizes = np.zeros((len(names), 2), dtype=np.int32)
+
+    for i, name in enumerate(names):
+        with Image.open(os.path.join(img_dir, name)) as img:
+            sizes[i] = img.size
+
+        ann_name = os.path.splitext(name)[0] + ".txt"
+        if ann_name in ann_files:
+            with open(os.path.join(ann_dir, ann_name)) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    x1, y1, x2, y2, cls = map(int, line.split())
+                    boxes.append((x1, y1, x2, y2))
+                    labels.append(cls + 1)
+        offsets[i + 1] = len(boxes)
+
+    return {
+        "names": np.array(names, dtype=np.str_),
+        "boxes": np.array(boxes, dtype=np.float32).reshape(-1, 4),
+        "labels": np.array(labels, dtype=np.int64),
+        "offsets": offsets,
+        "sizes": sizes,
+    }
+
+
+def index_path(ann_dir):
+    # Kept next to (not inside) ann_dir so writing it doesn't bump the mtime it is keyed on
+    ann_dir = os.path.normpath(ann_dir)
+    return os.path.join(os.path.dirname(ann_dir), f".{os.path.basename(ann_dir)}{INDEX_FILE}")
+
+
+def load_index(img_dir, ann_dir, cache=True):
+    """Load the packed index from disk, rebuilding it when either directory changed."""
+    dirs = [d for d in (img_dir, ann_dir) if os.path.isdir(d)]
+    key = _dir_key(*dirs)
+    cache_path = index_path(ann_dir)
+
+    if cache and os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            if np.array_equal(data["key"], key):
+                return {k: data[k] for k in data.files if k != "key"}
+
+    index = build_index(img_dir, ann_dir)
+    if cache:
+        # Write via a temp file so a half-written cache is never read back
+        tmp_path = cache_path + ".tmp.npz"
+        np.savez(tmp_path, key=key, **index)
+        os.replace(tmp_path, cache_path)
+    return index
+
+
 class MicroplasticDataset(torch.utils.data.Dataset):
-    def __init__(self, img_dir, ann_dir, transforms=None):
+    def __init__(self, img_dir, ann_dir, transforms=None, cache=True):
         self.img_dir = img_dir
         self.ann_dir = ann_dir
         self.transforms = transforms
-        self.images = os.listdir(img_dir)
+
+        index = load_index(img_dir, ann_dir, cache)
+        self.images = index["names"].tolist()
+        self.boxes = index["boxes"]
+        self.labels = index["labels"]
+        self.offsets = index["offsets"]
+        self.sizes = index["sizes"]
 
     def __len__(self):
         return len(self.images)
 
     def __getitem__(self, idx):
         img_path = os.path.join(self.img_dir, self.images[idx])
-        ann_path = os.path.join(
-            self.ann_dir,
-            self.images[idx].replace(".jpg", ".txt")
-        )
-
         image = Image.open(img_path).convert("RGB")
-        boxes, labels = [], []
-
-        if os.path.exists(ann_path):
-            with open(ann_path) as f:
-                for line in f:
-                    x1, y1, x2, y2, cls = map(int, line.split())
-                    boxes.append([x1, y1, x2, y2])
-                    labels.append(cls + 1)
 
+        start, end = self.offsets[idx], self.offsets[idx + 1]
         target = {
-            "boxes": torch.tensor(boxes, dtype=torch.float32),
-            "labels": torch.tensor(labels, dtype=torch.int64)
+            "boxes": torch.from_numpy(self.boxes[start:end].copy()),
+            "labels": torch.from_numpy(self.labels[start:end].copy())
         }
 
         if self.transforms:
             image = self.transforms(image)
 
         return image, target
+
+    def aspect_group_ids(self, bins=(0.5, 0.75, 1.0, 1.333, 2.0)):
+        """Bucket images by width/height so a batch needs little padding."""
+        ratios = self.sizes[:, 0] / np.maximum(self.sizes[:, 1], 1)
+        return np.digitize(ratios, bins)
+
+
+class GroupedBatchSampler(torch.utils.data.Sampler):
+    """Yield batches whose images all share a group id (e.g. an aspect-ratio bucket)."""
+
+    def __init__(self, group_ids, batch_size, shuffle=True, seed=0):
+        self.group_ids = np.asarray(group_ids)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        if self.shuffle:
+            rng = np.random.default_rng(self.seed + self.epoch)
+            order = rng.permutation(len(self.group_ids))
+        else:
+            order = np.arange(len(self.group_ids))
+
+        buckets = {}
+        for idx in order:
+            bucket = buckets.setdefault(int(self.group_ids[idx]), [])
+            bucket.append(int(idx))
+            if len(bucket) == self.batch_size:
+                yield bucket
+                buckets[int(self.group_ids[idx])] = []
+
+        for bucket in buckets.values():
+            if bucket:
+                yield bucket
+
+    def __len__(self):
+        counts = np.bincount(self.group_ids) if len(self.group_ids) else []
+        return int(sum(-(-c // self.batch_size) for c in counts))
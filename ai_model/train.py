@@ -1,45 +1,165 @@
+import os
+import time
+import argparse
+import contextlib
 import torch
 from torchvision import transforms
-from dataset import MicroplasticDataset
+from dataset import MicroplasticDataset, GroupedBatchSampler
 from model import get_model
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+CHECKPOINT_PATH = "checkpoints/last.pth"
+OUTPUT_PATH = "microplastic_detector.pth"
 
-dataset = MicroplasticDataset(
-    "dataset/images/train",
-    "dataset/annotations/train",
-    transforms=transforms.ToTensor()
-)
 
-loader = torch.utils.data.DataLoader(
-    dataset,
-    batch_size=2,
-    shuffle=True,
-    collate_fn=lambda x: tuple(zip(*x))
-)
+def collate_fn(batch):
+    # Module-level (not a lambda) so DataLoader workers can pickle it
+    return tuple(zip(*batch))
 
-model = get_model(num_classes=2)
-model.to(device)
 
-optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
+def autocast(device, enabled):
+    if not enabled:
+        return contextlib.nullcontext()
+    if device.type == "cuda":
+        return torch.autocast("cuda", dtype=torch.float16)
+    return torch.autocast("cpu", dtype=torch.bfloat16)
 
-for epoch in range(10):
+
+# ----------------------------
+# CHECKPOINTS
+# ----------------------------
+def save_checkpoint(path, model, optimizer, scaler, epoch):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    torch.save({
+        "epoch": epoch,
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "scaler": scaler.state_dict() if scaler is not None else None,
+        "rng": torch.get_rng_state(),
+    }, tmp_path)
+    # Atomic swap: a crash while saving never corrupts the last good checkpoint
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, model, optimizer, scaler):
+    state = torch.load(path, map_location="cpu", weights_only=False)
+    model.load_state_dict(state["model"])
+    optimizer.load_state_dict(state["optimizer"])
+    if scaler is not None and state.get("scaler"):
+        scaler.load_state_dict(state["scaler"])
+    torch.set_rng_state(state["rng"])
+    return state["epoch"] + 1
+
+
+# ----------------------------
+# TRAINING
+# ----------------------------
+def train_one_epoch(model, loader, optimizer, scaler, device, amp, accum_steps):
     model.train()
-    total_loss = 0
+    total_loss = 0.0
+    seen = 0
+    start = time.perf_counter()
 
-    for imgs, targets in loader:
-        imgs = [img.to(device) for img in imgs]
-        targets = [{k: v.to(device) for k, v in t.items()} for t in targets]
+    optimizer.zero_grad(set_to_none=True)
+    for step, (imgs, targets) in enumerate(loader, 1):
+        imgs = [img.to(device, non_blocking=True) for img in imgs]
+        targets = [{k: v.to(device, non_blocking=True) for k, v in t.items()} for t in targets]
 
-        losses = model(imgs, targets)
-        loss = sum(loss for loss in losses.values())
+        with autocast(device, amp):
+            losses = model(imgs, targets)
+            loss = sum(loss for loss in losses.values())
 
-        optimizer.zero_grad()
-        loss.backward()
-        optimizer.step()
+        # Average over the accumulation window so the effective LR is unchanged
+        scaled = loss / accum_steps
+        if scaler is not None:
+            scaler.scale(scaled).backward()
+        else:
+            scaled.backward()
+
+        if step % accum_steps == 0 or step == len(loader):
+            if scaler is not None:
+                scaler.step(optimizer)
+                scaler.update()
+            else:
+                optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
 
         total_loss += loss.item()
+        seen += len(imgs)
+
+    return total_loss, seen, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the Faster R-CNN microplastic detector")
+    parser.add_argument("--images", default="dataset/images/train")
+    parser.add_argument("--annotations", default="dataset/annotations/train")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=2)
+    parser.add_argument("--accum-steps", type=int, default=1,
+                        help="optimizer step every N batches (effective batch = batch-size × N)")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--lr", type=float, default=1e-4)
+    parser.add_argument("--no-group-aspect", action="store_true",
+                        help="plain shuffled batches instead of aspect-ratio-grouped ones")
+    parser.add_argument("--no-amp", action="store_true", help="disable bf16 (CPU) / fp16 (CUDA) autocast")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--checkpoint-every", type=int, default=1, help="epochs between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="continue from --checkpoint if it exists")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    amp = not args.no_amp
+
+    dataset = MicroplasticDataset(
+        args.images,
+        args.annotations,
+        transforms=transforms.ToTensor()
+    )
+
+    # Batching images of similar aspect ratio keeps Faster R-CNN's padding small
+    if args.no_group_aspect:
+        batch_sampler = None
+        batching = {"batch_size": args.batch_size, "shuffle": True}
+    else:
+        batch_sampler = GroupedBatchSampler(dataset.aspect_group_ids(), args.batch_size)
+        batching = {"batch_sampler": batch_sampler}
+
+    loader = torch.utils.data.DataLoader(
+        dataset,
+        **batching,
+        num_workers=args.workers,
+        pin_memory=device.type == "cuda",
+        persistent_workers=args.workers > 0,
+        collate_fn=collate_fn
+    )
+
+    model = get_model(num_classes=2)
+    model.to(device)
+
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+    # bf16 has fp32's exponent range, so only fp16 on CUDA needs loss scaling
+    scaler = torch.amp.GradScaler("cuda") if amp and device.type == "cuda" else None
+
+    start_epoch = 0
+    if args.resume and os.path.exists(args.checkpoint):
+        start_epoch = load_checkpoint(args.checkpoint, model, optimizer, scaler)
+        print(f"⏩ Resumed from {args.checkpoint} at epoch {start_epoch + 1}")
+
+    for epoch in range(start_epoch, args.epochs):
+        if batch_sampler is not None:
+            batch_sampler.set_epoch(epoch)
+        total_loss, seen, elapsed = train_one_epoch(
+            model, loader, optimizer, scaler, device, amp, args.accum_steps
+        )
+        print(f"Epoch {epoch+1} Loss: {total_loss:.3f} | {elapsed:.1f}s | {seen / elapsed:.2f} img/s")
+
+        if (epoch + 1) % args.checkpoint_every == 0 or epoch + 1 == args.epochs:
+            save_checkpoint(args.checkpoint, model, optimizer, scaler, epoch)
+
+    torch.save(model.state_dict(), args.output)
 
-    print(f"Epoch {epoch+1} Loss: {total_loss:.3f}")
 
-torch.save(model.state_dict(), "microplastic_detector.pth")
+if __name__ == "__main__":
+    main()
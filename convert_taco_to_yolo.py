@@ -1,7 +1,9 @@
 import json
 import os
 import shutil
-import random
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
 # =========================
@@ -16,6 +18,9 @@ TACO_DATA = "datasets/TACO/data"
 OUTPUT = "yolo_model/datasets/taco_yolo"
 
 TRAIN_SPLIT = 0.8
+SEED = 42
+
+MANIFEST = ".manifest.json"
 
 # Only plastic-related classes
 PLASTIC_CLASSES = [
@@ -28,90 +33,231 @@ PLASTIC_CLASSES = [
 ]
 
 # =========================
-# CREATE YOLO FOLDERS
+# BBOX CONVERSION
 # =========================
 
-os.makedirs(f"{OUTPUT}/images/train", exist_ok=True)
-os.makedirs(f"{OUTPUT}/images/val", exist_ok=True)
-os.makedirs(f"{OUTPUT}/labels/train", exist_ok=True)
-os.makedirs(f"{OUTPUT}/labels/val", exist_ok=True)
+def convert_bbox(bbox, img_w, img_h):
+    x, y, w, h = bbox
+    return (
+        (x + w / 2) / img_w,
+        (y + h / 2) / img_h,
+        w / img_w,
+        h / img_h
+    )
 
 # =========================
-# LOAD COCO ANNOTATIONS
+# SPLIT (deterministic, stable when images are added)
 # =========================
 
-with open(f"{TACO_DATA}/annotations.json", "r") as f:
-    coco = json.load(f)
-
-# Map category_id → class_index
-categories = {}
-class_id_map = {}
+def assign_subset(file_name, seed=SEED, train_split=TRAIN_SPLIT):
+    digest = hashlib.sha1(f"{seed}:{file_name}".encode()).hexdigest()
+    return "train" if int(digest[:8], 16) / 0x100000000 < train_split else "val"
 
-for c in coco["categories"]:
-    if c["name"] in PLASTIC_CLASSES:
-        class_id_map[c["id"]] = len(categories)
-        categories[c["id"]] = c["name"]
-
-print("✅ Plastic classes used:")
-for k, v in categories.items():
-    print(f"{class_id_map[k]} → {v}")
-
-# Image lookup
-images = {img["id"]: img for img in coco["images"]}
+# =========================
+# LINK / COPY
+# =========================
 
-# Collect annotations per image
-annotations = {}
-for ann in coco["annotations"]:
-    if ann["category_id"] in categories:
-        annotations.setdefault(ann["image_id"], []).append(ann)
+def _reflink(src, dst):
+    import fcntl
+    FICLONE = 0x40049409  # Linux: btrfs, xfs, ...
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
 
-image_ids = list(annotations.keys())
-random.shuffle(image_ids)
 
-split_index = int(len(image_ids) * TRAIN_SPLIT)
+def link_or_copy(src, dst):
+    """Hardlink, else reflink, else copy. Returns the method used."""
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "link"
+    except OSError:
+        pass
+    try:
+        _reflink(src, dst)
+        return "reflink"
+    except (OSError, ImportError):
+        if os.path.exists(dst):
+            os.remove(dst)
+    shutil.copy2(src, dst)
+    return "copy"
 
 # =========================
-# BBOX CONVERSION
+# CONVERSION
 # =========================
 
-def convert_bbox(bbox, img_w, img_h):
-    x, y, w, h = bbox
-    return (
-        (x + w / 2) / img_w,
-        (y + h / 2) / img_h,
-        w / img_w,
-        h / img_h
-    )
+def build_labels(anns, img, class_id_map):
+    lines = []
+    for ann in anns:
+        cls_id = class_id_map[ann["category_id"]]
+        x, y, w, h = convert_bbox(ann["bbox"], img["width"], img["height"])
+        lines.append(f"{cls_id} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n")
+    return "".join(lines)
 
-# =========================
-# CONVERSION LOOP
-# =========================
 
-for i, img_id in enumerate(tqdm(image_ids, desc="Converting TACO → YOLO")):
-    img = images[img_id]
-    anns = annotations[img_id]
+def convert_one(img, anns, class_id_map, taco_data, output, seed, train_split, previous):
+    """Convert a single image. Returns (file_name, manifest_entry, action)."""
+    src_img = os.path.join(taco_data, img["file_name"])
+    try:
+        st = os.stat(src_img)
+    except FileNotFoundError:
+        return img["file_name"], None, "missing"
 
-    src_img = os.path.join(TACO_DATA, img["file_name"])
-    if not os.path.exists(src_img):
-        continue
+    subset = assign_subset(img["file_name"], seed, train_split)
+    # TACO file names repeat across batch folders; keep the batch in the name
+    stem = os.path.splitext(img["file_name"].replace("/", "_"))[0]
+    ext = os.path.splitext(src_img)[1]
 
-    subset = "train" if i < split_index else "val"
+    labels = build_labels(anns, img, class_id_map)
+    entry = {
+        "subset": subset,
+        "stem": stem,
+        "ext": ext,
+        "src_mtime_ns": st.st_mtime_ns,
+        "src_size": st.st_size,
+        "labels_sha1": hashlib.sha1(labels.encode()).hexdigest(),
+    }
 
-    # Copy image
-    dst_img = f"{OUTPUT}/images/{subset}/{os.path.basename(src_img)}"
-    shutil.copy(src_img, dst_img)
+    dst_img = os.path.join(output, "images", subset, stem + ext)
+    label_path = os.path.join(output, "labels", subset, stem + ".txt")
 
-    # Write label file
-    label_file = os.path.splitext(os.path.basename(src_img))[0] + ".txt"
-    label_path = f"{OUTPUT}/labels/{subset}/{label_file}"
+    if previous == entry and os.path.exists(dst_img) and os.path.exists(label_path):
+        return img["file_name"], entry, "skipped"
 
+    method = link_or_copy(src_img, dst_img)
     with open(label_path, "w") as lf:
-        for ann in anns:
-            cls_id = class_id_map[ann["category_id"]]
-            x, y, w, h = convert_bbox(
-                ann["bbox"], img["width"], img["height"]
+        lf.write(labels)
+
+    return img["file_name"], entry, method
+
+
+def remove_outputs(output, entry):
+    for path in (
+        os.path.join(output, "images", entry["subset"], entry["stem"] + entry["ext"]),
+        os.path.join(output, "labels", entry["subset"], entry["stem"] + ".txt"),
+    ):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def sweep_untracked(output, manifest):
+    """
+    Remove image/label files the manifest doesn't account for, e.g. outputs of
+    the old unseeded, un-prefixed converter. Left in place, the same photo can
+    sit in both train and val.
+    """
+    expected = set()
+    for entry in manifest.values():
+        expected.add(os.path.join("images", entry["subset"], entry["stem"] + entry["ext"]))
+        expected.add(os.path.join("labels", entry["subset"], entry["stem"] + ".txt"))
+
+    removed = 0
+    for sub in ("images/train", "images/val", "labels/train", "labels/val"):
+        with os.scandir(os.path.join(output, sub)) as it:
+            for e in it:
+                if e.is_file() and os.path.join(sub, e.name).replace("/", os.sep) not in expected:
+                    os.remove(e.path)
+                    removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert TACO (COCO) annotations to a YOLO dataset")
+    parser.add_argument("--taco", default=TACO_DATA)
+    parser.add_argument("--output", default=OUTPUT)
+    parser.add_argument("--train-split", type=float, default=TRAIN_SPLIT)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) * 4))
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and redo everything")
+    args = parser.parse_args()
+
+    # =========================
+    # CREATE YOLO FOLDERS
+    # =========================
+
+    for sub in ("images/train", "images/val", "labels/train", "labels/val"):
+        os.makedirs(os.path.join(args.output, sub), exist_ok=True)
+
+    # =========================
+    # LOAD COCO ANNOTATIONS
+    # =========================
+
+    with open(os.path.join(args.taco, "annotations.json"), "r") as f:
+        coco = json.load(f)
+
+    # Map category_id → class_index
+    categories = {}
+    class_id_map = {}
+
+    for c in coco["categories"]:
+        if c["name"] in PLASTIC_CLASSES:
+            class_id_map[c["id"]] = len(categories)
+            categories[c["id"]] = c["name"]
+
+    print("✅ Plastic classes used:")
+    for k, v in categories.items():
+        print(f"{class_id_map[k]} → {v}")
+
+    # Image lookup
+    images = {img["id"]: img for img in coco["images"]}
+
+    # Collect annotations per image
+    annotations = {}
+    for ann in coco["annotations"]:
+        if ann["category_id"] in categories:
+            annotations.setdefault(ann["image_id"], []).append(ann)
+
+    # =========================
+    # MANIFEST
+    # =========================
+
+    manifest_path = os.path.join(args.output, MANIFEST)
+    previous = {}
+    if not args.force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+
+    # =========================
+    # CONVERSION LOOP
+    # =========================
+
+    manifest = {}
+    counts = {}
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(
+                convert_one, images[img_id], anns, class_id_map, args.taco, args.output,
+                args.seed, args.train_split, previous.get(images[img_id]["file_name"]),
             )
-            lf.write(f"{cls_id} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n")
+            for img_id, anns in annotations.items()
+        ]
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Converting TACO → YOLO"):
+            file_name, entry, action = fut.result()
+            counts[action] = counts.get(action, 0) + 1
+            if entry is not None:
+                manifest[file_name] = entry
+
+    # Drop outputs of images that vanished or moved to the other split
+    stale = 0
+    for file_name, old in previous.items():
+        new = manifest.get(file_name)
+        if new is None or (new["subset"], new["stem"], new["ext"]) != (old["subset"], old["stem"], old["ext"]):
+            remove_outputs(args.output, old)
+            stale += 1
+
+    # The output tree is owned by this script: anything else is stale too
+    stale += sweep_untracked(args.output, manifest)
+
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+    print("\n✅ TACO → YOLO conversion completed successfully")
+    print(f"📊 {counts} | stale removed: {stale}")
+    print(f"📁 Dataset saved at: {args.output}")
+
 
-print("\n✅ TACO → YOLO conversion completed successfully")
-print(f"📁 Dataset saved at: {OUTPUT}")
+if __name__ == "__main__":
+    main()
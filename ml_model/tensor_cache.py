@@ -0,0 +1,119 @@
+# ml_model/tensor_cache.py
+"""
+One-time preprocessing of the classifier dataset into a memory-mapped array.
+
+    cache/images.npy   uint8 (N, 3, H, W), already resized
+    cache/labels.npy   int64 (N,)
+    cache/index.json   source files + mtimes, used to detect a stale cache
+
+Training then reads samples straight out of the page cache with no JPEG
+decode or resize per epoch.
+"""
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+from PIL import Image
+
+INDEX_FILE = "index.json"
+IMAGES_FILE = "images.npy"
+LABELS_FILE = "labels.npy"
+
+
+# -------------------------
+# SOURCE LISTING
+# -------------------------
+def list_samples(dataset_dir, positive_folders, negative_folders):
+    samples = []
+    for folders, label in ((positive_folders, 1), (negative_folders, 0)):
+        for folder in folders:
+            path = os.path.join(dataset_dir, folder)
+            with os.scandir(path) as it:
+                entries = sorted((e for e in it if e.is_file()), key=lambda e: e.name)
+            for e in entries:
+                st = e.stat()
+                samples.append([e.path, label, st.st_mtime_ns, st.st_size])
+    return samples
+
+
+def _load_resized(args):
+    path, size = args
+    # Same decode + resize as transforms.Resize on a default_loader image
+    with Image.open(path) as img:
+        img = img.convert("RGB").resize((size, size), Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8).transpose(2, 0, 1)
+
+
+# -------------------------
+# BUILD
+# -------------------------
+def is_fresh(cache_dir, samples, size):
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return index.get("size") == size and index.get("samples") == samples
+
+
+def build_cache(dataset_dir, cache_dir, positive_folders, negative_folders,
+                size=128, workers=None, force=False):
+    """Decode + resize every image once; no-op if the cache matches the sources."""
+    samples = list_samples(dataset_dir, positive_folders, negative_folders)
+    if not force and is_fresh(cache_dir, samples, size):
+        return cache_dir
+
+    os.makedirs(cache_dir, exist_ok=True)
+    n = len(samples)
+
+    # Invalidate first: if this rebuild dies midway, the next run must not
+    # find the old index next to a half-written images.npy
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+    images_path = os.path.join(cache_dir, IMAGES_FILE)
+    images = np.lib.format.open_memmap(images_path, mode="w+", dtype=np.uint8,
+                                       shape=(n, 3, size, size))
+    labels = np.fromiter((s[1] for s in samples), dtype=np.int64, count=n)
+
+    jobs = [(s[0], size) for s in samples]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i, arr in enumerate(pool.map(_load_resized, jobs, chunksize=64)):
+            images[i] = arr
+
+    images.flush()
+    del images
+    np.save(os.path.join(cache_dir, LABELS_FILE), labels)
+
+    # Index last: a cache without a matching index is treated as stale
+    with open(index_path + ".tmp", "w") as f:
+        json.dump({"size": size, "count": n, "samples": samples}, f)
+    os.replace(index_path + ".tmp", index_path)
+
+    print(f"✅ Cached {n} images at {size}x{size} → {cache_dir}")
+    return cache_dir
+
+
+# -------------------------
+# DATASET
+# -------------------------
+class CachedMicroplasticDataset(torch.utils.data.Dataset):
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.labels = np.load(os.path.join(cache_dir, LABELS_FILE))
+        # Opened lazily so each DataLoader worker maps the file itself
+        # instead of receiving a pickled copy of the array
+        self._images = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        if self._images is None:
+            self._images = np.load(os.path.join(self.cache_dir, IMAGES_FILE), mmap_mode="r")
+
+        image = torch.from_numpy(np.array(self._images[idx])).float().div_(255.0)
+        return image, int(self.labels[idx])
@@ -1,14 +1,19 @@
 import os
+import time
+import argparse
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from torchvision import datasets, transforms, models
 from torch.utils.data import DataLoader
 
+from tensor_cache import build_cache, CachedMicroplasticDataset
+
 # -------------------------
 # PATH
 # -------------------------
 DATASET_DIR = "dataset"
+CACHE_DIR = os.path.join(DATASET_DIR, ".cache_128")
 
 POSITIVE_FOLDERS = [
     "PE", "PE_with_dust",
@@ -21,16 +26,18 @@ NEGATIVE_FOLDERS = [
     "clean", "bubble", "none", "LEPD_with_dust"
 ]
 
+IMAGE_SIZE = 128
+
 # -------------------------
 # TRANSFORMS
 # -------------------------
 transform = transforms.Compose([
-    transforms.Resize((128, 128)),
+    transforms.Resize((IMAGE_SIZE, IMAGE_SIZE)),
     transforms.ToTensor(),
 ])
 
 # -------------------------
-# CUSTOM DATASET
+# CUSTOM DATASET (decodes every epoch; kept for --no-cache comparisons)
 # -------------------------
 class MicroplasticDataset(torch.utils.data.Dataset):
     def __init__(self):
@@ -55,30 +62,46 @@ class MicroplasticDataset(torch.utils.data.Dataset):
         image = transform(image)
         return image, label
 
-dataset = MicroplasticDataset()
-loader = DataLoader(dataset, batch_size=16, shuffle=True)
+# -------------------------
+# DATA LOADING
+# -------------------------
+def make_loader(use_cache=True, workers=4, batch_size=16):
+    if use_cache:
+        build_cache(DATASET_DIR, CACHE_DIR, POSITIVE_FOLDERS, NEGATIVE_FOLDERS, size=IMAGE_SIZE)
+        dataset = CachedMicroplasticDataset(CACHE_DIR)
+    else:
+        dataset = MicroplasticDataset()
+
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=True,
+        num_workers=workers,
+        pin_memory=torch.cuda.is_available(),
+        persistent_workers=workers > 0,
+        prefetch_factor=4 if workers > 0 else None,
+    )
 
 # -------------------------
 # MODEL
 # -------------------------
-model = models.resnet18(weights=None)
-model.fc = nn.Linear(model.fc.in_features, 2)
-
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model.to(device)
+def make_model(device):
+    model = models.resnet18(weights=None)
+    model.fc = nn.Linear(model.fc.in_features, 2)
+    return model.to(device)
 
 # -------------------------
 # TRAINING
 # -------------------------
-criterion = nn.CrossEntropyLoss()
-optimizer = optim.Adam(model.parameters(), lr=0.0001)
-
-for epoch in range(10):
+def train_epoch(model, loader, criterion, optimizer, device):
     model.train()
     total_loss = 0
+    seen = 0
+    start = time.perf_counter()
 
     for images, labels in loader:
-        images, labels = images.to(device), labels.to(device)
+        images = images.to(device, non_blocking=True)
+        labels = labels.to(device, non_blocking=True)
 
         optimizer.zero_grad()
         outputs = model(images)
@@ -87,11 +110,55 @@ for epoch in range(10):
         optimizer.step()
 
         total_loss += loss.item()
+        seen += images.size(0)
 
-    print(f"Epoch {epoch+1}: Loss = {total_loss:.4f}")
+    return total_loss, seen, time.perf_counter() - start
 
-# -------------------------
-# SAVE MODEL
-# -------------------------
-torch.save(model.state_dict(), "microplastic_cnn.pth")
-print("✅ Training complete, model saved")
+
+def compare_epoch_time(device, workers, batch_size):
+    """Time one epoch with the decode-per-epoch dataset vs the memory-mapped cache."""
+    criterion = nn.CrossEntropyLoss()
+    for name, use_cache, w in (("decode", False, 0), ("cached", True, workers)):
+        torch.manual_seed(0)
+        model = make_model(device)
+        optimizer = optim.Adam(model.parameters(), lr=0.0001)
+        loader = make_loader(use_cache, w, batch_size)
+        _, seen, elapsed = train_epoch(model, loader, criterion, optimizer, device)
+        print(f"⏱  {name:>6}: {elapsed:.1f}s/epoch ({seen / elapsed:.0f} img/s, workers={w})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the ResNet18 microplastic classifier")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--no-cache", action="store_true", help="decode JPEGs every epoch (old behaviour)")
+    parser.add_argument("--compare", action="store_true", help="time one epoch with and without the cache")
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    if args.compare:
+        compare_epoch_time(device, args.workers, args.batch_size)
+        return
+
+    workers = 0 if args.no_cache else args.workers
+    loader = make_loader(not args.no_cache, workers, args.batch_size)
+    model = make_model(device)
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=0.0001)
+
+    for epoch in range(args.epochs):
+        total_loss, seen, elapsed = train_epoch(model, loader, criterion, optimizer, device)
+        print(f"Epoch {epoch+1}: Loss = {total_loss:.4f} | {elapsed:.1f}s ({seen / elapsed:.0f} img/s)")
+
+    # -------------------------
+    # SAVE MODEL
+    # -------------------------
+    torch.save(model.state_dict(), "microplastic_cnn.pth")
+    print("✅ Training complete, model saved")
+
+
+if __name__ == "__main__":
+    main()
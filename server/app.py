@@ -8,15 +8,34 @@ os.environ["ULTRALYTICS_HUB"] = "false"
 import uuid
 import time
 import json
+import logging
+import shutil
+import tempfile
+import threading
+import zipfile
 import cv2
+import numpy as np
 import torch
-import torch.nn as nn
-from torchvision import models, transforms
-from PIL import Image
 
-from flask import Flask, jsonify, request, send_from_directory, Response
+from flask import Flask, jsonify, request, send_file, Response
 from flask_cors import CORS
-from ultralytics import YOLO
+
+import cascade
+import metrics
+import report
+import static_cache
+from metrics import span
+from cnn_audit import load_cnn, score_rois, score_frame
+from enhance import enhance
+from model_registry import ModelRegistry
+from event_recorder import EventRecorder, dhash
+
+# ===================== LOGGING =====================
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+log = logging.getLogger("nivora")
 
 # ===================== PATH SETUP =====================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,48 +43,39 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 HISTORY_FILE = os.path.join(BASE_DIR, "history.json")
+VARIANT_DIR = os.path.join(BASE_DIR, ".static_cache")  # thumbnails / WebP copies of STATIC_DIR
 
 # 🔴 IMPORTANT FIX — model is OUTSIDE server folder
 ROOT_DIR = os.path.dirname(BASE_DIR)
 
 YOLO_MODEL_PATH = os.path.join(ROOT_DIR, "ml_model", "weights", "best.pt")
 CNN_MODEL_PATH  = os.path.join(ROOT_DIR, "ml_model", "microplastic_cnn.pth")
+STATUS_FILE = os.path.join(ROOT_DIR, "status.json")
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(STATIC_DIR, exist_ok=True)
 
-print("YOLO PATH:", YOLO_MODEL_PATH)
-print("YOLO EXISTS:", os.path.isfile(YOLO_MODEL_PATH))
+log.info("YOLO PATH: %s", YOLO_MODEL_PATH)
+log.info("YOLO EXISTS: %s", os.path.isfile(YOLO_MODEL_PATH))
 
 # ===================== DEVICE =====================
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print(f"🚀 Detection Engine starting (Device: {device})")
+log.info("🚀 Detection Engine starting (Device: %s)", device)
 
 # ===================== LOAD YOLO =====================
 if not os.path.isfile(YOLO_MODEL_PATH):
     raise FileNotFoundError(f"❌ YOLO model missing: {YOLO_MODEL_PATH}")
 
-yolo_model = YOLO(YOLO_MODEL_PATH)
-print("✅ YOLO loaded (offline)")
+# Watches the weights file and hot-swaps new versions between requests
+MODEL_POLL_INTERVAL = float(os.environ.get("MODEL_POLL_INTERVAL", "5"))
+registry = ModelRegistry(YOLO_MODEL_PATH, poll_interval=MODEL_POLL_INTERVAL)
+registry.load_initial()
+registry.start()
 
 # ===================== LOAD CNN (OPTIONAL) =====================
-cnn_model = None
-cnn_tf = transforms.Compose([
-    transforms.Resize((128, 128)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.5]*3, std=[0.5]*3)
-])
-
-if os.path.isfile(CNN_MODEL_PATH):
-    cnn_model = models.resnet18(weights=None)
-    cnn_model.fc = nn.Linear(cnn_model.fc.in_features, 2)
-    cnn_model.load_state_dict(
-        torch.load(CNN_MODEL_PATH, map_location=device, weights_only=False)
-    )
-    cnn_model.to(device).eval()
-    print("✅ CNN auditor loaded")
-else:
-    print("⚠️ CNN not found → YOLO only")
+cnn_model = load_cnn(CNN_MODEL_PATH, device)
+if cnn_model is None:
+    log.warning("⚠️ CNN not found → YOLO only")
 
 # ===================== FLASK APP =====================
 app = Flask(__name__)
@@ -76,19 +86,58 @@ CONF_THRESHOLD = 0.15       # Accept detections with 15%+ confidence (lowered)
 YOLO_CONF = 0.05            # YOLO initial detection threshold (lowered)
 CNN_THRESHOLD = 0.6         # CNN validation threshold (if enabled)
 USE_CNN_VALIDATION = False  # Set to True to enable CNN double-check
+ENHANCE_INPUT = os.environ.get("ENHANCE_INPUT", "0") == "1"  # CLAHE + unsharp before YOLO
+ENABLE_MACRO_CASCADE = os.environ.get("ENABLE_MACRO_CASCADE", "0") == "1"  # also run macroplastic.pt
+MACRO_CONF = float(os.environ.get("MACRO_CONF", "0.25"))
+
+# Clean-water pre-gate: skip YOLO when the CNN's whole-frame score is below the gate.
+# Unset = disabled. PREGATE_SHADOW=1 still runs YOLO to measure what the gate would miss.
+PREGATE_THRESHOLD = float(os.environ["PREGATE_THRESHOLD"]) if os.environ.get("PREGATE_THRESHOLD") else None
+PREGATE_SIZE = int(os.environ.get("PREGATE_SIZE", "128"))
+PREGATE_SHADOW = os.environ.get("PREGATE_SHADOW", "0") == "1"
+
+# ===================== LOAD MACRO MODEL (OPTIONAL) =====================
+macro_model = None
+if ENABLE_MACRO_CASCADE:
+    from macro_inference import MACRO_MODEL_PATH, get_model as get_macro_model
+
+    if os.path.isfile(MACRO_MODEL_PATH):
+        macro_model = get_macro_model(MACRO_MODEL_PATH)
+        log.info("✅ Macroplastic model loaded (%s)", MACRO_MODEL_PATH)
+    else:
+        log.warning("⚠️ Macroplastic model not found (%s) → microplastics only", MACRO_MODEL_PATH)
+
+# ===================== INFERENCE LOCK =====================
+# Ultralytics predictors keep per-call state, so a model must not run on two
+# threads at once (threaded Flask, ASGI uploads + /live producer). One lock
+# covers the micro and macro models, which detect() only uses together.
+yolo_lock = threading.Lock()
 
 # ===================== HISTORY =====================
-def save_to_history(entry):
-    history = []
+_history_lock = threading.Lock()
+
+def load_history():
     if os.path.isfile(HISTORY_FILE):
         with open(HISTORY_FILE) as f:
-            history = json.load(f)
+            return json.load(f)
+    return []
 
-    history.insert(0, entry)
-    history[:] = history[:50]
-
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(history, f, indent=2)
+def save_to_history(entry):
+    # Read-modify-write; serialised so concurrent uploads don't drop entries
+    with _history_lock:
+        history = []
+        if os.path.isfile(HISTORY_FILE):
+            with open(HISTORY_FILE) as f:
+                history = json.load(f)
+
+        history.insert(0, entry)
+        history[:] = history[:50]
+
+        # Replace atomically: unlocked readers (ASGI /api/history) never see a partial file
+        tmp = f"{HISTORY_FILE}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(history, f, indent=2)
+        os.replace(tmp, HISTORY_FILE)
 
 # ===================== CNN VALIDATION =====================
 def validate_with_cnn(roi_bgr):
@@ -100,43 +149,316 @@ def validate_with_cnn(roi_bgr):
         return True, 1.0  # If no CNN, accept all
     
     try:
-        # Convert BGR to RGB
-        roi_rgb = cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2RGB)
-        pil_img = Image.fromarray(roi_rgb)
-        
-        # Transform and predict
-        tensor = cnn_tf(pil_img).unsqueeze(0).to(device)
-        
-        with torch.no_grad():
-            outputs = cnn_model(tensor)
-            probs = torch.softmax(outputs, dim=1)[0]
-            confidence = float(probs[1])  # Probability of being plastic
-            is_plastic = confidence >= CNN_THRESHOLD
-        
-        return is_plastic, confidence
+        confidence = score_rois(cnn_model, [roi_bgr], device)[0]  # Probability of being plastic
+        return confidence >= CNN_THRESHOLD, confidence
     except Exception as e:
-        print(f"⚠️ CNN validation error: {e}")
+        log.warning("⚠️ CNN validation error: %s", e)
         return True, 1.0  # On error, accept detection
 
+# ===================== DETECTION PIPELINE =====================
+def accept_boxes(img, candidates, pipeline):
+    """
+    Threshold + optional CNN audit of YOLO candidates; draws accepted boxes in place.
+    Returns (detections, max_conf, boxes) where boxes are (x1, y1, x2, y2, conf).
+    """
+    debug = log.isEnabledFor(logging.DEBUG)
+    boxes = []
+    max_conf = 0.0
+
+    if debug:
+        log.debug("🔍 YOLO candidates: %d", len(candidates))
+
+    for x1, y1, x2, y2, conf in candidates:
+        if conf < CONF_THRESHOLD:
+            continue
+
+        # Extract ROI
+        roi = img[y1:y2, x1:x2]
+        if roi.size == 0:
+            continue
+
+        # Validate with CNN if enabled
+        is_plastic = True
+        cnn_conf = 1.0
+
+        if USE_CNN_VALIDATION and cnn_model is not None:
+            with span(pipeline, "cnn_audit"):
+                is_plastic, cnn_conf = validate_with_cnn(roi)
+            if debug:
+                log.debug("📦 YOLO: %.3f | CNN: %.3f | Plastic: %s", conf, cnn_conf, is_plastic)
+        elif debug:
+            log.debug("📦 YOLO: %.3f", conf)
+
+        if not is_plastic:
+            metrics.CNN_REJECTS.inc(pipeline=pipeline)
+            continue
+
+        boxes.append((x1, y1, x2, y2, conf))
+        max_conf = max(max_conf, conf)
+
+        # Draw bounding box
+        cv2.rectangle(img, (x1, y1), (x2, y2), (0, 0, 255), 2)
+
+        # Add label (live frames keep the short form)
+        if pipeline == "live":
+            label = f"{conf:.2f}"
+        elif USE_CNN_VALIDATION:
+            label = f"P:{conf:.2f}|C:{cnn_conf:.2f}"
+        else:
+            label = f"PLASTIC {conf:.2f}"
+
+        cv2.putText(
+            img,
+            label,
+            (x1, y1 - 6),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            (0, 0, 255),
+            2,
+        )
+
+    return len(boxes), max_conf, boxes
+
+def draw_macro(img, boxes):
+    for x1, y1, x2, y2, conf in boxes:
+        cv2.rectangle(img, (x1, y1), (x2, y2), (0, 165, 255), 2)
+        cv2.putText(img, f"MACRO {conf:.2f}", (x1, y1 - 6),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 165, 255), 2)
+
+def pregate(img, pipeline, extras=None):
+    """True when the frame should go on to YOLO."""
+    if PREGATE_THRESHOLD is None or cnn_model is None:
+        return True
+
+    with span(pipeline, "pregate"):
+        score = score_frame(cnn_model, img, device, PREGATE_SIZE)
+    passed = score >= PREGATE_THRESHOLD
+    metrics.PREGATE.inc(pipeline=pipeline, outcome="pass" if passed else "skip")
+    if extras is not None:
+        extras["pregate_score"] = round(score, 3)
+        # Lets clients tell a skipped frame from one YOLO found clean
+        extras["pregate"] = "passed" if passed else ("shadow_skip" if PREGATE_SHADOW else "skipped")
+    return passed
+
+def detect(img, model, pipeline="upload", extras=None):
+    """
+    Run YOLO (+ optional CNN audit, + optional macro cascade) on a BGR image and
+    draw accepted boxes in place. Returns (detections, max_conf, boxes).
+    When `extras` is a dict, cascade results and per-model timings are added to it.
+    """
+    gate_passed = pregate(img, pipeline, extras)
+    if not gate_passed and not PREGATE_SHADOW:
+        metrics.REQUESTS.inc(pipeline=pipeline)
+        return 0, 0.0, []
+
+    # YOLO sees the enhanced copy; boxes, CNN crops and drawing use the original
+    yolo_input = img
+    if ENHANCE_INPUT:
+        with span(pipeline, "enhance"):
+            yolo_input = enhance(img)
+
+    if ENABLE_MACRO_CASCADE and macro_model is not None:
+        # One letterbox pass shared by both detectors, which run concurrently
+        with yolo_lock:
+            out = cascade.run(yolo_input, model.model, macro_model, YOLO_CONF, MACRO_CONF)
+        timings = out["timings_ms"]
+        metrics.STAGE_LATENCY.observe(timings["letterbox"] / 1000.0, pipeline=pipeline, stage="letterbox")
+        metrics.STAGE_LATENCY.observe(timings["micro"] / 1000.0, pipeline=pipeline, stage="yolo")
+        metrics.STAGE_LATENCY.observe(timings["macro"] / 1000.0, pipeline=pipeline, stage="macro")
+        candidates = out["micro"]
+
+        macro_boxes = out["macro"]
+        draw_macro(img, macro_boxes)
+        if extras is not None:
+            extras["macro"] = {
+                "detections": len(macro_boxes),
+                "confidence": round(max((b[4] for b in macro_boxes), default=0.0), 3),
+            }
+            extras["timings_ms"] = {k: round(v, 2) for k, v in timings.items()}
+    else:
+        with span(pipeline, "yolo"), yolo_lock:
+            results = model.model(yolo_input, conf=YOLO_CONF, verbose=False)
+        candidates = cascade.boxes_from_results(results)
+
+    with span(pipeline, "postprocess"):
+        detections, max_conf, boxes = accept_boxes(img, candidates, pipeline)
+
+    if detections and PREGATE_THRESHOLD is not None and cnn_model is not None:
+        metrics.PREGATE_POSITIVE.inc(pipeline=pipeline)
+        if not gate_passed:
+            # Shadow mode: the gate would have dropped a frame YOLO found plastic in
+            metrics.PREGATE_MISSED.inc(pipeline=pipeline)
+
+    metrics.REQUESTS.inc(pipeline=pipeline)
+    metrics.DETECTIONS.inc(detections, pipeline=pipeline)
+    return detections, max_conf, boxes
+
 # ===================== ROUTES =====================
 @app.route("/")
 def health():
     return jsonify({"status": "NIVORA AI Detection API Online"})
 
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+static_files = static_cache.StaticCache(STATIC_DIR, VARIANT_DIR)
+
 @app.route("/api/static/<path:filename>")
 def serve_static(filename):
-    return send_from_directory(STATIC_DIR, filename)
+    """Result images with strong ETags; ?w=256 for a thumbnail, WebP when accepted"""
+    asset = static_files.resolve(
+        filename,
+        width=static_cache.parse_width(request.args.get("w")),
+        accept=request.headers.get("Accept", ""),
+    )
+    if asset is None:
+        return jsonify({"error": "Not found"}), 404
+
+    resp = send_file(asset.path, mimetype=asset.mimetype, etag=asset.etag, conditional=True)
+    resp.headers["Cache-Control"] = asset.cache_control
+    if asset.vary:
+        resp.headers["Vary"] = asset.vary
+    return resp
 
 @app.route("/api/history", methods=["GET"])
 def get_history():
     """Return detection history"""
-    if os.path.isfile(HISTORY_FILE):
-        with open(HISTORY_FILE) as f:
-            history = json.load(f)
-        return jsonify(history)
-    return jsonify([])
+    return jsonify(load_history())
+
+# ===================== REPORTS =====================
+REPORT_SOURCES = ("csv", "history", "all")
+
+@app.route("/api/report", methods=["GET"])
+def get_report():
+    """Build a report on demand (streamed from disk) and return it as a download"""
+    fmt = request.args.get("format", "xlsx")
+    source = request.args.get("source", "all")
+    if fmt not in ("xlsx", "csv") or source not in REPORT_SOURCES:
+        return jsonify({"error": "format must be xlsx|csv, source csv|history|all"}), 400
+
+    # Private scratch dir per request: concurrent requests never share a path,
+    # and nothing is left behind in reports/ once the download is sent
+    name = f"Microplastic_Report_{time.strftime('%Y%m%d_%H%M%S')}"
+    workdir = tempfile.mkdtemp(prefix="nivora-report-")
+    try:
+        result = report.build_report(os.path.join(workdir, f"{name}.{fmt}"), source, fmt)
+        path = result["path"]
+        if path.endswith(".csv"):
+            # CSV has no second sheet: ship the records and the summary together
+            summary_path = os.path.splitext(path)[0] + "_summary.csv"
+            path = os.path.join(workdir, f"{name}.zip")
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.write(result["path"], f"{name}.csv")
+                zf.write(summary_path, f"{name}_summary.csv")
+
+        response = send_file(path, as_attachment=True, download_name=os.path.basename(path))
+    except Exception:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    response.call_on_close(lambda: shutil.rmtree(workdir, ignore_errors=True))
+    return response
+
+@app.route("/api/report/summary", methods=["GET"])
+def get_report_summary():
+    source = request.args.get("source", "all")
+    if source not in REPORT_SOURCES:
+        return jsonify({"error": "source must be csv|history|all"}), 400
+    return jsonify(report.summarize(source))
+
+# ===================== PRE-GATE STATS =====================
+@app.route("/api/pregate", methods=["GET"])
+def pregate_stats():
+    """Per-stage skip rates: pre-gate skips, and CNN audit rejections of YOLO boxes"""
+    stats = {
+        "enabled": PREGATE_THRESHOLD is not None and cnn_model is not None,
+        "threshold": PREGATE_THRESHOLD,
+        "shadow": PREGATE_SHADOW,
+    }
+    for pipeline in ("upload", "live"):
+        passed = metrics.PREGATE.value(pipeline=pipeline, outcome="pass")
+        skipped = metrics.PREGATE.value(pipeline=pipeline, outcome="skip")
+        missed = metrics.PREGATE_MISSED.value(pipeline=pipeline)
+        positive = metrics.PREGATE_POSITIVE.value(pipeline=pipeline)
+        accepted = metrics.DETECTIONS.value(pipeline=pipeline)
+        rejected = metrics.CNN_REJECTS.value(pipeline=pipeline)
+        gated = passed + skipped
+        stats[pipeline] = {
+            "frames": metrics.REQUESTS.value(pipeline=pipeline),
+            "pregate_skip_rate": round(skipped / gated, 4) if gated else 0.0,
+            "pregate_skipped": skipped,
+            # Only measurable in shadow mode: share of frames YOLO found plastic in
+            # that the gate would have dropped (the recall cost, 1 - recall)
+            "pregate_missed": missed,
+            "pregate_miss_rate": round(missed / positive, 4) if positive and PREGATE_SHADOW else None,
+            "cnn_reject_rate": round(rejected / (accepted + rejected), 4) if accepted + rejected else 0.0,
+        }
+    return jsonify(stats)
+
+# ===================== MODEL REGISTRY =====================
+@app.route("/api/models", methods=["GET"])
+def list_models():
+    return jsonify(registry.versions())
+
+@app.route("/api/models/reload", methods=["POST"])
+def reload_model():
+    try:
+        registry.reload()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify(registry.versions())
+
+@app.route("/api/models/rollback", methods=["POST"])
+def rollback_model():
+    if registry.rollback() is None:
+        return jsonify({"error": "No previous version to roll back to"}), 409
+    return jsonify(registry.versions())
 
 # ===================== IMAGE UPLOAD =====================
+def process_upload(data):
+    """
+    Full /upload pipeline on the raw file bytes (shared by the Flask and ASGI apps).
+    Returns the response dict, or None when the bytes are not a decodable image.
+    """
+    uid = uuid.uuid4().hex
+    input_path = os.path.join(UPLOAD_DIR, f"{uid}.jpg")
+    with span("upload", "disk_write"):
+        with open(input_path, "wb") as f:
+            f.write(data)
+
+    with span("upload", "decode"):
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+
+    model = registry.current()
+    extras = {}
+    detections, max_conf, _ = detect(img, model, "upload", extras)
+
+    # Save result image
+    out_name = f"result_{uid}.jpg"
+    with span("upload", "encode"):
+        _, encoded = cv2.imencode(".jpg", img)
+    with span("upload", "disk_write"):
+        with open(os.path.join(STATIC_DIR, out_name), "wb") as f:
+            f.write(encoded.tobytes())
+
+    # Create response
+    response = {
+        "status": "Microplastics Detected" if detections else "Clean Water",
+        "detections": detections,
+        "confidence": round(max_conf, 3),
+        "color": "danger" if detections else "safe",
+        "image_url": f"/api/static/{out_name}",
+        "timestamp": int(time.time()),
+        "model_version": model.version,
+        **extras,
+    }
+
+    with span("upload", "history_write"):
+        save_to_history(response)
+    return response
+
 @app.route("/upload", methods=["POST"])
 def upload():
     try:
@@ -144,96 +466,28 @@ def upload():
         if not file:
             return jsonify({"error": "No file uploaded"}), 400
 
-        uid = uuid.uuid4().hex
-        input_path = os.path.join(UPLOAD_DIR, f"{uid}.jpg")
-        file.save(input_path)
-
-        img = cv2.imread(input_path)
-        if img is None:
+        response = process_upload(file.read())
+        if response is None:
             return jsonify({"error": "Invalid image"}), 400
-
-        detections = 0
-        max_conf = 0.0
-
-        # Run YOLO detection
-        results = yolo_model(img, conf=YOLO_CONF, verbose=False)
-
-        print(f"🔍 YOLO candidates:", len(results[0].boxes) if results[0].boxes else 0)
-
-        for r in results:
-            if r.boxes is None:
-                continue
-
-            for box in r.boxes:
-                conf = float(box.conf[0])
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-
-                # Extract ROI
-                roi = img[y1:y2, x1:x2]
-                if roi.size == 0:
-                    continue
-
-                # Validate with CNN if enabled
-                is_plastic = True
-                cnn_conf = 1.0
-                
-                if USE_CNN_VALIDATION and cnn_model is not None:
-                    is_plastic, cnn_conf = validate_with_cnn(roi)
-                    print(f"📦 YOLO: {conf:.3f} | CNN: {cnn_conf:.3f} | Plastic: {is_plastic}")
-                else:
-                    print(f"📦 YOLO: {conf:.3f}")
-
-                # Accept if passes both thresholds
-                if conf >= CONF_THRESHOLD and is_plastic:
-                    detections += 1
-                    max_conf = max(max_conf, conf)
-                    
-                    # Draw bounding box
-                    cv2.rectangle(img, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                    
-                    # Add label
-                    label = f"PLASTIC {conf:.2f}"
-                    if USE_CNN_VALIDATION:
-                        label = f"P:{conf:.2f}|C:{cnn_conf:.2f}"
-                    
-                    cv2.putText(
-                        img,
-                        label,
-                        (x1, y1 - 6),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (0, 0, 255),
-                        2,
-                    )
-                    print("✅ Accepted detection")
-
-        # Save result image
-        out_name = f"result_{uid}.jpg"
-        cv2.imwrite(os.path.join(STATIC_DIR, out_name), img)
-
-        # Create response
-        response = {
-            "status": "Microplastics Detected" if detections else "Clean Water",
-            "detections": detections,
-            "confidence": round(max_conf, 3),
-            "color": "danger" if detections else "safe",
-            "image_url": f"/api/static/{out_name}",
-            "timestamp": int(time.time()),
-        }
-
-        save_to_history(response)
         return jsonify(response)
 
     except Exception as e:
-        print("❌ UPLOAD ERROR:", e)
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ UPLOAD ERROR: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # ===================== LIVE ESP32 STREAM =====================
-ESP32_STREAM_URL = "http://10.63.103.202:81/stream"
+# Point at `python mjpeg_sim.py` to test without the board
+ESP32_STREAM_URL = os.environ.get("ESP32_STREAM_URL", "http://10.63.103.202:81/stream")
 cap = None
 
+# Set to None to run the live loop without recording (e.g. in tests)
+events = EventRecorder(
+    STATIC_DIR, STATUS_FILE, save_to_history,
+    capacity=int(os.environ.get("EVENT_BUFFER", "100")),
+    hash_distance=int(os.environ.get("EVENT_HASH_DISTANCE", "10")),
+    box_similarity=float(os.environ.get("EVENT_BOX_SIMILARITY", "0.5")),
+)
+
 latest_result = {
     "status": "Waiting",
     "detections": 0,
@@ -243,8 +497,10 @@ latest_result = {
 def get_cap():
     global cap
     if cap is None or not cap.isOpened():
-        print("🔄 Connecting to ESP32 stream...")
-        cap = cv2.VideoCapture(ESP32_STREAM_URL, cv2.CAP_FFMPEG)
+        log.info("🔄 Connecting to ESP32 stream %s...", ESP32_STREAM_URL)
+        metrics.RECONNECTS.inc()
+        with span("live", "connect"):
+            cap = cv2.VideoCapture(ESP32_STREAM_URL, cv2.CAP_FFMPEG)
         cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     return cap
 
@@ -253,55 +509,55 @@ def generate_frames():
 
     while True:
         cap = get_cap()
-        ret, frame = cap.read()
+        with span("live", "decode"):
+            ret, frame = cap.read()
 
         if not ret:
+            # A dropped MJPEG connection can leave the capture "open"; force a reconnect
+            cap.release()
             time.sleep(0.1)
             continue
 
-        detections = 0
-        max_conf = 0.0
-
-        # Run YOLO on frame
-        results = yolo_model(frame, conf=YOLO_CONF, verbose=False)
-
-        for r in results:
-            if r.boxes is None:
-                continue
-            for box in r.boxes:
-                conf = float(box.conf[0])
-                
-                # Apply threshold
-                if conf >= CONF_THRESHOLD:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    
-                    # Optional CNN validation for live stream
-                    is_plastic = True
-                    if USE_CNN_VALIDATION and cnn_model is not None:
-                        roi = frame[y1:y2, x1:x2]
-                        is_plastic, _ = validate_with_cnn(roi)
-                    
-                    if is_plastic:
-                        detections += 1
-                        max_conf = max(max_conf, conf)
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                        cv2.putText(
-                            frame,
-                            f"{conf:.2f}",
-                            (x1, y1 - 6),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.5,
-                            (0, 0, 255),
-                            2,
-                        )
-
-        latest_result["status"] = "Microplastics Detected" if detections else "Clean Water"
-        latest_result["detections"] = detections
-        latest_result["confidence"] = round(max_conf, 3)
-
-        _, buffer = cv2.imencode(".jpg", frame)
+        # Hash before detect() draws boxes and confidence labels on the frame
+        frame_hash = dhash(frame) if events is not None else None
+
+        model = registry.current()
+        extras = {}
+        detections, max_conf, boxes = detect(frame, model, "live", extras)
+
+        # Rebuilt per frame: a skipped frame has no macro/timing extras, and
+        # stale ones from an earlier frame must not linger next to it
+        latest_result = {
+            "status": "Microplastics Detected" if detections else "Clean Water",
+            "detections": detections,
+            "confidence": round(max_conf, 3),
+            "model_version": model.version,
+            **extras,
+        }
+
+        with span("live", "encode"):
+            _, buffer = cv2.imencode(".jpg", frame)
+
+        if detections and events is not None:
+            # Persist only when the scene changes, not every frame of the same sample
+            with span("live", "record"):
+                events.observe(frame_hash, boxes, buffer, {
+                    "status": latest_result["status"],
+                    "detections": detections,
+                    "confidence": latest_result["confidence"],
+                    "color": "danger",
+                    "model_version": model.version,
+                })
         yield b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + buffer.tobytes() + b"\r\n"
 
+@app.route("/api/events", methods=["GET"])
+def recent_events():
+    """Recent de-duplicated live detection events, newest first"""
+    limit = request.args.get("limit", type=int)
+    if events is None:
+        return jsonify({"events": [], "duplicates": 0})
+    return jsonify({"events": events.recent(limit), "duplicates": events.duplicates})
+
 @app.route("/live")
 def live():
     return Response(generate_frames(),
@@ -319,6 +575,10 @@ if __name__ == "__main__":
     print(f"YOLO Confidence Threshold: {YOLO_CONF}")
     print(f"Final Confidence Threshold: {CONF_THRESHOLD}")
     print(f"CNN Validation: {'ENABLED' if USE_CNN_VALIDATION else 'DISABLED'}")
+    print(f"Input Enhancement: {'ENABLED' if ENHANCE_INPUT else 'DISABLED'}")
+    print(f"Macro Cascade: {'ENABLED' if macro_model is not None else 'DISABLED'}")
+    if PREGATE_THRESHOLD is not None:
+        print(f"Clean-water Pre-gate: {PREGATE_THRESHOLD} @ {PREGATE_SIZE}px{' (shadow)' if PREGATE_SHADOW else ''}")
     if USE_CNN_VALIDATION:
         print(f"CNN Threshold: {CNN_THRESHOLD}")
     print("="*60 + "\n")
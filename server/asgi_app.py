@@ -0,0 +1,236 @@
+"""
+ASGI serving mode for the detection API.
+
+Same routes as app.py, but request I/O runs on an asyncio event loop:
+slow upload bodies, long /live connections and /result polls no longer
+pin a worker thread each. Decode + inference are dispatched to a bounded
+thread pool; when too many jobs are queued, /upload answers 503 with
+Retry-After instead of piling up. All /live viewers share one capture +
+inference loop. Routes not defined here fall through to the Flask app.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+    python asgi_app.py
+
+Needs: starlette, uvicorn, python-multipart.
+"""
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+import app as detection  # loads the models once
+import metrics
+import static_cache
+
+log = logging.getLogger("nivora.asgi")
+
+# ===================== PARAMS (CONFIGURABLE) =====================
+# YOLO itself is serialised by app.yolo_lock (shared with the /live producer);
+# more workers only overlap decode / CNN / encode / disk work around it
+INFER_WORKERS = int(os.environ.get("INFER_WORKERS", "1"))
+MAX_PENDING = int(os.environ.get("MAX_PENDING", "8"))  # uploads being read, queued or running before shedding
+
+infer_pool = ThreadPoolExecutor(max_workers=INFER_WORKERS, thread_name_prefix="infer")
+
+INFLIGHT = metrics.REGISTRY.gauge("nivora_inflight_jobs", "Admitted uploads being read, queued or run")
+SHED = metrics.REGISTRY.counter("nivora_shed_total", "Requests rejected with 503 by admission control", ("route",))
+
+
+# ===================== ADMISSION CONTROL =====================
+class Admission:
+    """Counts admitted uploads (body read through inference); only touched from the event loop."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.inflight = 0
+
+    def try_enter(self):
+        if self.inflight >= self.limit:
+            return False
+        self.inflight += 1
+        INFLIGHT.set(self.inflight)
+        return True
+
+    def leave(self):
+        self.inflight -= 1
+        INFLIGHT.set(self.inflight)
+
+
+admission = Admission(MAX_PENDING)
+
+
+def busy(route):
+    SHED.inc(route=route)
+    return JSONResponse({"error": "Server busy, retry shortly"}, status_code=503,
+                        headers={"Retry-After": "1"})
+
+
+# ===================== LIVE BROADCAST =====================
+class LiveBroadcaster:
+    """
+    One producer runs generate_frames() on its own thread while at least one
+    viewer is connected; every viewer gets the latest encoded frame.
+    """
+
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live")
+        self._cond = asyncio.Condition()
+        self._frame = None
+        self._seq = 0
+        self._running = False
+        self._task = None
+        self.viewers = 0
+
+    def _ensure_producer(self):
+        # _running flips to False as soon as the loop exits (no await in
+        # between), so a viewer arriving while the old task winds down
+        # starts a fresh producer instead of waiting on a finished one
+        if not self._running:
+            self._running = True
+            self._task = asyncio.create_task(self._produce())
+
+    async def _produce(self):
+        loop = asyncio.get_running_loop()
+        gen = detection.generate_frames()
+        try:
+            while self.viewers > 0:
+                chunk = await loop.run_in_executor(self._pool, next, gen)
+                async with self._cond:
+                    self._frame = chunk
+                    self._seq += 1
+                    self._cond.notify_all()
+        except Exception:
+            log.exception("❌ Live producer stopped")
+        finally:
+            self._running = False
+            async with self._cond:
+                self._cond.notify_all()  # wake viewers so none waits on a dead producer
+            await loop.run_in_executor(self._pool, gen.close)
+
+    async def stream(self):
+        self.viewers += 1
+        self._ensure_producer()
+
+        seen = self._seq
+        try:
+            while True:
+                async with self._cond:
+                    await self._cond.wait_for(lambda: self._seq != seen or not self._running)
+                    if self._seq == seen:
+                        return  # producer failed: end the response, the client reconnects
+                    seen, chunk = self._seq, self._frame
+                yield chunk
+        finally:
+            self.viewers -= 1
+
+
+broadcaster = LiveBroadcaster()
+
+
+# ===================== ROUTES =====================
+async def upload(request):
+    # Admit before touching the body: a shed request is never read or spooled
+    if not admission.try_enter():
+        return busy("upload")
+    try:
+        try:
+            # Body is read on the event loop: a slow client costs no thread
+            form = await request.form()
+            file = form.get("file")
+            if file is None or isinstance(file, str):
+                return JSONResponse({"error": "No file uploaded"}, status_code=400)
+            data = await file.read()
+        except Exception as e:
+            return JSONResponse({"error": f"Bad upload: {e}"}, status_code=400)
+
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(infer_pool, detection.process_upload, data)
+    except Exception as e:
+        log.exception("❌ UPLOAD ERROR: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+    finally:
+        admission.leave()
+
+    if response is None:
+        return JSONResponse({"error": "Invalid image"}, status_code=400)
+    return JSONResponse(response)
+
+
+async def live(request):
+    return StreamingResponse(broadcaster.stream(),
+                             media_type="multipart/x-mixed-replace; boundary=frame")
+
+
+async def result(request):
+    return JSONResponse(detection.latest_result)
+
+
+async def history(request):
+    loop = asyncio.get_running_loop()
+    return JSONResponse(await loop.run_in_executor(None, detection.load_history))
+
+
+async def serve_static(request):
+    # Thumbnail / WebP encoding may run on a cache miss: keep it off the loop
+    loop = asyncio.get_running_loop()
+    asset = await loop.run_in_executor(
+        None,
+        detection.static_files.resolve,
+        request.path_params["filename"],
+        static_cache.parse_width(request.query_params.get("w")),
+        request.headers.get("accept", ""),
+    )
+    if asset is None:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+
+    headers = {"ETag": f'"{asset.etag}"', "Cache-Control": asset.cache_control}
+    if asset.vary:
+        headers["Vary"] = asset.vary
+    if headers["ETag"] in _etag_list(request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(asset.path, media_type=asset.mimetype, headers=headers)
+
+
+def _etag_list(header):
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")} if header else set()
+
+
+async def health(request):
+    return JSONResponse({"status": "NIVORA AI Detection API Online", "mode": "asgi"})
+
+
+async def metrics_endpoint(request):
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+app = Starlette(
+    routes=[
+        Route("/", health),
+        Route("/metrics", metrics_endpoint),
+        Route("/upload", upload, methods=["POST"]),
+        Route("/live", live),
+        Route("/result", result),
+        Route("/api/history", history),
+        Route("/api/static/{filename:path}", serve_static),
+        # Everything else (reports, models, pre-gate stats) is served by the Flask app
+        Mount("/", app=WSGIMiddleware(detection.app)),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", "5000")))
@@ -0,0 +1,210 @@
+"""
+Offline batch inference over a folder (or glob) of sample images.
+
+Models are loaded once, images are decoded and letterboxed to the model
+input size in a process pool (so only small arrays cross the process
+boundary) while the main process runs batched YOLO (+ optional CNN
+audit), and one row per image is appended to a CSV. Re-running with the same --out skips images
+already in it, so an interrupted run resumes where it stopped.
+
+    python batch_infer.py samples/ --out results.csv
+    python batch_infer.py "data/**/*.jpg" --out results.parquet --cnn
+"""
+import os
+import csv
+import glob
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ["YOLO_OFFLINE"] = "true"
+os.environ["ULTRALYTICS_SETTINGS"] = "false"
+os.environ["ULTRALYTICS_HUB"] = "false"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+
+YOLO_MODEL_PATH = os.path.join(ROOT_DIR, "ml_model", "weights", "best.pt")
+CNN_MODEL_PATH = os.path.join(ROOT_DIR, "ml_model", "microplastic_cnn.pth")
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+FIELDS = ["path", "status", "detections", "confidence", "boxes", "model_version", "cnn", "seconds"]
+
+
+# ===================== INPUTS =====================
+def find_images(source):
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTS))
+    else:
+        paths = [p for p in glob.glob(source, recursive=True) if p.lower().endswith(IMAGE_EXTS)]
+    return sorted(os.path.abspath(p) for p in paths)
+
+
+def processed_paths(out_csv):
+    if not os.path.isfile(out_csv):
+        return set()
+    with open(out_csv, newline="") as f:
+        return {row["path"] for row in csv.DictReader(f)}
+
+
+def decode(path, imgsz, keep_full):
+    """
+    Runs in a worker process. Returns (path, item) where item is None for an
+    unreadable file, else (letterboxed, scale, pad, shape, full image or None).
+    """
+    import cv2
+    import cascade
+
+    img = cv2.imread(path)
+    if img is None:
+        return path, None
+    boxed, scale, pad = cascade.letterbox(img, imgsz)
+    return path, (boxed, scale, pad, img.shape, img if keep_full else None)
+
+
+def decoded_batches(paths, batch_size, pool, prefetch, imgsz, keep_full):
+    """Yield lists of (path, item) from decode(), keeping at most `prefetch` decodes in flight."""
+    pending = deque()
+    it = iter(paths)
+    batch = []
+
+    for path in it:
+        pending.append(pool.submit(decode, path, imgsz, keep_full))
+        if len(pending) >= prefetch:
+            break
+
+    while pending:
+        batch.append(pending.popleft().result())
+        nxt = next(it, None)
+        if nxt is not None:
+            pending.append(pool.submit(decode, nxt, imgsz, keep_full))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+# ===================== INFERENCE =====================
+def run_batch(batch, yolo, cnn, device, args):
+    from cascade import boxes_from_results
+    from cnn_audit import score_rois
+
+    # Inputs are already imgsz x imgsz, so Ultralytics' own letterbox is a no-op
+    images = [item[0] for _, item in batch if item is not None]
+    start = time.perf_counter()
+    results = yolo(images, conf=args.yolo_conf, imgsz=args.imgsz, verbose=False) if images else []
+    per_image = (time.perf_counter() - start) / max(len(images), 1)
+
+    rows = []
+    res_iter = iter(results)
+    for path, item in batch:
+        if item is None:
+            rows.append({"path": path, "status": "Unreadable", "detections": 0, "confidence": 0.0,
+                         "boxes": "[]", "cnn": False, "seconds": 0.0})
+            continue
+
+        _, scale, pad, shape, img = item
+        boxes = [b for b in boxes_from_results([next(res_iter)], scale, pad, shape) if b[4] >= args.conf]
+
+        if cnn is not None and boxes:
+            rois = [img[y1:y2, x1:x2] for x1, y1, x2, y2, _ in boxes]
+            keep = [i for i, roi in enumerate(rois) if roi.size]
+            scores = score_rois(cnn, [rois[i] for i in keep], device)
+            boxes = [boxes[i] for i, s in zip(keep, scores) if s >= args.cnn_threshold]
+
+        max_conf = max((b[4] for b in boxes), default=0.0)
+        rows.append({
+            "path": path,
+            "status": "Microplastics Detected" if boxes else "Clean Water",
+            "detections": len(boxes),
+            "confidence": round(max_conf, 3),
+            "boxes": json.dumps([[x1, y1, x2, y2, round(c, 4)] for x1, y1, x2, y2, c in boxes]),
+            "cnn": cnn is not None,
+            "seconds": round(per_image, 4),
+        })
+    return rows
+
+
+def to_parquet(csv_path, parquet_path):
+    try:
+        import pyarrow.csv as pv
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("❌ Parquet output needs pyarrow (pip install pyarrow)")
+    pq.write_table(pv.read_csv(csv_path), parquet_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch microplastic detection over many images")
+    parser.add_argument("source", help="directory (searched recursively) or glob pattern")
+    parser.add_argument("--out", default="batch_results.csv", help=".csv or .parquet")
+    parser.add_argument("--model", default=YOLO_MODEL_PATH)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--imgsz", type=int, default=640, help="model input size (letterboxed in the workers)")
+    # Defaults match app.py
+    parser.add_argument("--yolo-conf", type=float, default=0.05)
+    parser.add_argument("--conf", type=float, default=0.15)
+    parser.add_argument("--cnn", action="store_true", help="audit boxes with the ResNet classifier")
+    parser.add_argument("--cnn-threshold", type=float, default=0.6)
+    args = parser.parse_args(argv)
+
+    parquet_out = args.out if args.out.endswith(".parquet") else None
+    csv_out = os.path.splitext(args.out)[0] + ".csv" if parquet_out else args.out
+
+    paths = find_images(args.source)
+    done = processed_paths(csv_out)
+    todo = [p for p in paths if p not in done]
+    print(f"🗂  {len(paths)} images found, {len(done)} already processed, {len(todo)} to go")
+
+    if todo:
+        import torch
+        from model_registry import ModelRegistry
+        from cnn_audit import load_cnn
+
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        registry = ModelRegistry(args.model)
+        model = registry.load_initial()
+        cnn = load_cnn(CNN_MODEL_PATH, device) if args.cnn else None
+        if args.cnn and cnn is None:
+            print("⚠️ CNN not found → YOLO only")
+
+        new_file = not os.path.isfile(csv_out)
+        start = time.perf_counter()
+        count = 0
+
+        with open(csv_out, "a", newline="") as f, \
+                ProcessPoolExecutor(max_workers=args.workers) as pool:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            if new_file:
+                writer.writeheader()
+
+            # Full-resolution pixels only come back when the CNN needs ROI crops
+            for batch in decoded_batches(todo, args.batch_size, pool, args.batch_size * 4,
+                                         args.imgsz, keep_full=cnn is not None):
+                for row in run_batch(batch, model.model, cnn, device, args):
+                    row["model_version"] = model.version
+                    writer.writerow(row)
+                # Flush per batch so a crash loses at most one batch
+                f.flush()
+                count += len(batch)
+                print(f"\r⚙️  {count}/{len(todo)} | {count / (time.perf_counter() - start):.1f} img/s",
+                      end="", flush=True)
+        print()
+
+    if parquet_out:
+        to_parquet(csv_out, parquet_out)
+        print(f"✅ Results written to {parquet_out}")
+    else:
+        print(f"✅ Results written to {csv_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""
+Reproducible benchmark suite for the detection server.
+
+Runs the same pipeline code as app.py on seeded synthetic images (and
+optionally the sample images in static/outputs) and writes a JSON file so
+runs can be compared:
+
+    python benchmark.py --out bench/base.json
+    python benchmark.py --out bench/new.json --samples
+    python benchmark.py --compare bench/base.json bench/new.json
+"""
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLES_DIR = os.path.join(BASE_DIR, "static", "outputs")
+
+
+# ===================== INPUTS =====================
+def synthetic_images(n, size=(480, 640), seed=0):
+    """Water-like background with a few small bright/dark particles."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    h, w = size
+    images = []
+    for _ in range(n):
+        base = np.empty((h, w, 3), dtype=np.uint8)
+        base[:] = rng.integers(60, 140, size=3, dtype=np.uint8)
+        noise = rng.normal(0, 8, size=(h, w, 3))
+        img = np.clip(base + noise, 0, 255).astype(np.uint8)
+
+        for _ in range(int(rng.integers(0, 12))):
+            center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+            axes = (int(rng.integers(2, 14)), int(rng.integers(2, 14)))
+            color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+            cv2.ellipse(img, center, axes, float(rng.integers(0, 180)), 0, 360, color, -1)
+
+        images.append(img)
+    return images
+
+
+def sample_images():
+    import cv2
+
+    paths = sorted(p for p in glob.glob(os.path.join(SAMPLES_DIR, "*.jpg")) if not p.endswith("_out.jpg"))
+    return [img for img in (cv2.imread(p) for p in paths) if img is not None]
+
+
+# ===================== HELPERS =====================
+def percentiles(samples_s):
+    arr = np.asarray(samples_s) * 1000.0
+    return {
+        "n": int(arr.size),
+        "mean_ms": float(arr.mean()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "max_ms": float(arr.max()),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ===================== SCENARIOS =====================
+def bench_cold_start(runs=3):
+    """Time to import app.py (model load + warm-up) in a fresh interpreter."""
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    env = dict(os.environ, MODEL_POLL_INTERVAL="3600", LOG_LEVEL="WARNING")
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, env=env,
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return percentiles(samples)
+
+
+def bench_latency(app, images, warmup=3):
+    model = app.registry.current()
+    for img in images[:warmup]:
+        app.detect(img.copy(), model)
+
+    samples = []
+    detections = 0
+    for img in images:
+        frame = img.copy()
+        start = time.perf_counter()
+        n, _, _ = app.detect(frame, model)
+        samples.append(time.perf_counter() - start)
+        detections += n
+
+    result = percentiles(samples)
+    result["detections"] = detections
+    return result
+
+
+def bench_throughput(app, images, batch_sizes=(1, 4, 8)):
+    yolo = app.registry.current().model
+    results = {}
+    for bs in batch_sizes:
+        batches = [images[i:i + bs] for i in range(0, len(images) - bs + 1, bs)]
+        if not batches:
+            continue
+        yolo(batches[0], conf=app.YOLO_CONF, verbose=False)
+
+        start = time.perf_counter()
+        for batch in batches:
+            yolo(batch, conf=app.YOLO_CONF, verbose=False)
+        elapsed = time.perf_counter() - start
+
+        results[f"batch_{bs}"] = {
+            "images": len(batches) * bs,
+            "images_per_s": len(batches) * bs / elapsed,
+        }
+    return results
+
+
+def bench_cnn_overhead(app, images):
+    if app.cnn_model is None:
+        return {"skipped": "CNN checkpoint not found"}
+
+    saved = app.USE_CNN_VALIDATION
+    try:
+        app.USE_CNN_VALIDATION = False
+        off = bench_latency(app, images)
+        app.USE_CNN_VALIDATION = True
+        on = bench_latency(app, images)
+    finally:
+        app.USE_CNN_VALIDATION = saved
+
+    return {
+        "off": off,
+        "on": on,
+        "overhead_p50_ms": on["p50_ms"] - off["p50_ms"],
+    }
+
+
+def bench_enhance(app, images):
+    """Extra latency of the enhancement stage and how many more boxes YOLO accepts with it."""
+    from enhance import enhance
+
+    for img in images[:3]:
+        enhance(img)
+    samples = []
+    for img in images:
+        start = time.perf_counter()
+        enhance(img)
+        samples.append(time.perf_counter() - start)
+
+    saved = app.ENHANCE_INPUT
+    try:
+        app.ENHANCE_INPUT = False
+        off = bench_latency(app, images)
+        app.ENHANCE_INPUT = True
+        on = bench_latency(app, images)
+    finally:
+        app.ENHANCE_INPUT = saved
+
+    return {
+        "enhance_only": percentiles(samples),
+        "off": off,
+        "on": on,
+        "overhead_p50_ms": on["p50_ms"] - off["p50_ms"],
+        # No ground truth for the samples: accepted-box count is the recall proxy
+        "detections_gain": on["detections"] - off["detections"],
+    }
+
+
+def bench_cascade(app, images):
+    """Micro-only vs micro + macro cascade on the same frames."""
+    if app.macro_model is None:
+        return {"skipped": "macro cascade disabled or macroplastic.pt not found"}
+
+    saved = app.ENABLE_MACRO_CASCADE
+    try:
+        app.ENABLE_MACRO_CASCADE = False
+        off = bench_latency(app, images)
+        app.ENABLE_MACRO_CASCADE = True
+        on = bench_latency(app, images)
+    finally:
+        app.ENABLE_MACRO_CASCADE = saved
+
+    return {"micro_only": off, "cascade": on, "overhead_p50_ms": on["p50_ms"] - off["p50_ms"]}
+
+
+def bench_pregate(app, images, gates=(0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7)):
+    """
+    Sweep the clean-water gate: per threshold, how many frames skip YOLO, how many
+    frames with detections would be lost (recall cost) and the expected latency.
+    """
+    from cnn_audit import score_frame
+
+    if app.cnn_model is None:
+        return {"skipped": "CNN checkpoint not found"}
+
+    model = app.registry.current()
+    saved = app.PREGATE_THRESHOLD
+    app.PREGATE_THRESHOLD = None
+    try:
+        rows = []
+        for img in images:
+            start = time.perf_counter()
+            score = score_frame(app.cnn_model, img, app.device, app.PREGATE_SIZE)
+            gate_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            n, _, _ = app.detect(img.copy(), model)
+            rows.append((score, n, gate_s, time.perf_counter() - start))
+    finally:
+        app.PREGATE_THRESHOLD = saved
+
+    scores = np.array([r[0] for r in rows])
+    positive = np.array([r[1] > 0 for r in rows])
+    gate_ms = np.array([r[2] for r in rows]) * 1000.0
+    full_ms = np.array([r[3] for r in rows]) * 1000.0
+
+    sweep = {}
+    for gate in gates:
+        passed = scores >= gate
+        sweep[f"gate_{gate:g}"] = {
+            "skip_rate": float(1.0 - passed.mean()),
+            "recall": float(passed[positive].mean()) if positive.any() else None,
+            "mean_latency_ms": float(gate_ms.mean() + (full_ms * passed).mean()),
+        }
+
+    return {
+        "gate_latency": percentiles(gate_ms / 1000.0),
+        "no_gate_mean_ms": float(full_ms.mean()),
+        "positive_frames": int(positive.sum()),
+        "sweep": sweep,
+    }
+
+
+def bench_live(app, images, frames=100, fps=0.0, disconnect_after=0):
+    """
+    Drive generate_frames() from a local MJPEG source; fps=0 means as fast as possible.
+    With disconnect_after, the source drops the client every N frames so the
+    reconnect path is included in the measurement.
+    """
+    from mjpeg_sim import MJPEGServer, encode_frames
+    from event_recorder import EventRecorder
+
+    sim = MJPEGServer(encode_frames(images), fps=fps, disconnect_after=disconnect_after).start()
+
+    # Synthetic frames must not land in static/, history.json or status.json;
+    # a scratch recorder keeps the recording cost in the measurement
+    scratch = tempfile.TemporaryDirectory(prefix="nivora-bench-")
+    saved_url, saved_events = app.ESP32_STREAM_URL, app.events
+    app.ESP32_STREAM_URL = sim.url
+    app.events = EventRecorder(scratch.name, os.path.join(scratch.name, "status.json"), lambda event: None)
+    app.cap = None
+    try:
+        gen = app.generate_frames()
+        start = time.perf_counter()
+        next(gen)
+        first_frame_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            next(gen)
+        elapsed = time.perf_counter() - start
+        gen.close()
+    finally:
+        if app.cap is not None:
+            app.cap.release()
+        app.cap = None
+        app.ESP32_STREAM_URL = saved_url
+        app.events = saved_events
+        scratch.cleanup()
+        sim.stop()
+
+    result = {
+        "frames": frames,
+        "fps": frames / elapsed,
+        "first_frame_ms": first_frame_s * 1000.0,
+        "connections": sim.connections,
+    }
+    connect = app.metrics.STAGE_LATENCY.snapshot(pipeline="live", stage="connect")
+    if connect and connect["count"]:
+        result["mean_connect_ms"] = connect["sum"] / connect["count"] * 1000.0
+    return result
+
+
+# ===================== RUNNER =====================
+def run(args):
+    os.environ.setdefault("MODEL_POLL_INTERVAL", "3600")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    report = {
+        "meta": {
+            "timestamp": int(time.time()),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "images": args.images,
+            "size": args.size,
+        },
+        "results": {},
+    }
+    results = report["results"]
+
+    if not args.skip_cold_start:
+        print("⏱  cold start...")
+        results["cold_start"] = bench_cold_start(args.cold_runs)
+
+    rss_before = peak_rss_mb()
+    import app
+    import torch
+    report["meta"]["torch"] = torch.__version__
+    report["meta"]["device"] = str(app.device)
+    report["meta"]["model_version"] = app.registry.current().version
+    results["load_rss_mb"] = peak_rss_mb() - rss_before
+
+    h, w = args.size
+    images = synthetic_images(args.images, size=(h, w), seed=args.seed)
+
+    print("⏱  single-image latency (synthetic)...")
+    results["latency_synthetic"] = bench_latency(app, images)
+
+    samples = sample_images() if args.samples else []
+    if samples:
+        print(f"⏱  single-image latency ({len(samples)} samples)...")
+        results["latency_samples"] = bench_latency(app, samples)
+
+    print("⏱  batched throughput...")
+    results["throughput"] = bench_throughput(app, images)
+
+    print("⏱  CNN audit overhead...")
+    results["cnn_audit"] = bench_cnn_overhead(app, images)
+
+    print("⏱  macro cascade...")
+    results["cascade"] = bench_cascade(app, images)
+
+    print("⏱  clean-water pre-gate sweep...")
+    results["pregate"] = bench_pregate(app, samples or images)
+
+    print("⏱  input enhancement...")
+    results["enhance"] = bench_enhance(app, samples or images)
+
+    if not args.skip_live:
+        print("⏱  live stream FPS...")
+        results["live"] = bench_live(app, images, frames=args.live_frames)
+        if args.reconnect_every:
+            print("⏱  live stream reconnects...")
+            results["live_reconnect"] = bench_live(app, images, frames=args.live_frames,
+                                                   disconnect_after=args.reconnect_every)
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def _flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = _flatten(json.load(f)["results"])
+    with open(new_path) as f:
+        new = _flatten(json.load(f)["results"])
+
+    print(f"{'metric':<45} {'old':>12} {'new':>12} {'change':>9}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{key:<45} {a:>12.3f} {b:>12.3f} {change:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the NIVORA detection pipeline")
+    parser.add_argument("--out", default=os.path.join(BASE_DIR, "bench", f"bench_{int(time.time())}.json"))
+    parser.add_argument("--images", type=int, default=32, help="number of synthetic images")
+    parser.add_argument("--size", type=int, nargs=2, default=(480, 640), metavar=("H", "W"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--samples", action="store_true", help="also time the images in static/outputs")
+    parser.add_argument("--cold-runs", type=int, default=3)
+    parser.add_argument("--live-frames", type=int, default=100)
+    parser.add_argument("--reconnect-every", type=int, default=0,
+                        help="also run the live scenario with the source dropping clients every N frames")
+    parser.add_argument("--skip-cold-start", action="store_true")
+    parser.add_argument("--skip-live", action="store_true")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Micro + macroplastic cascade over a single shared frame pass.
+
+The frame is letterboxed once; both YOLO models receive the same
+square input (so Ultralytics' own letterbox is a no-op) and run
+concurrently on a small thread pool — PyTorch releases the GIL during
+inference. Boxes are mapped back to original-image coordinates.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+IMGSZ = 640
+PAD_VALUE = (114, 114, 114)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cascade")
+
+
+def letterbox(img, size=IMGSZ):
+    """Resize keeping aspect ratio and pad to size×size. Returns (img, scale, (pad_x, pad_y))."""
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = round(w * scale), round(h * scale)
+
+    if (new_w, new_h) != (w, h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+    left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=PAD_VALUE)
+    return img, scale, (left, top)
+
+
+def boxes_from_results(results, scale=1.0, pad=(0, 0), shape=None):
+    """Flatten Ultralytics results into (x1, y1, x2, y2, conf) tuples in original coordinates."""
+    out = []
+    pad_x, pad_y = pad
+    for r in results:
+        if r.boxes is None or not len(r.boxes):
+            continue
+        for (x1, y1, x2, y2), conf in zip(r.boxes.xyxy.tolist(), r.boxes.conf.tolist()):
+            x1, x2 = (x1 - pad_x) / scale, (x2 - pad_x) / scale
+            y1, y2 = (y1 - pad_y) / scale, (y2 - pad_y) / scale
+            if shape is not None:
+                h, w = shape[:2]
+                x1, x2 = min(max(x1, 0), w), min(max(x2, 0), w)
+                y1, y2 = min(max(y1, 0), h), min(max(y2, 0), h)
+            out.append((int(x1), int(y1), int(x2), int(y2), conf))
+    return out
+
+
+def _timed(model, img, conf):
+    start = time.perf_counter()
+    results = model(img, conf=conf, imgsz=IMGSZ, verbose=False)
+    return results, time.perf_counter() - start
+
+
+def run(img, micro_model, macro_model, micro_conf, macro_conf):
+    """
+    Returns {"micro": [...], "macro": [...] or None, "timings_ms": {...}} with
+    boxes in `img` coordinates.
+    """
+    start = time.perf_counter()
+    boxed, scale, pad = letterbox(img)
+    timings = {"letterbox": (time.perf_counter() - start) * 1000.0}
+
+    macro_future = None
+    if macro_model is not None:
+        macro_future = _executor.submit(_timed, macro_model, boxed, macro_conf)
+    micro_results, micro_s = _timed(micro_model, boxed, micro_conf)
+    timings["micro"] = micro_s * 1000.0
+
+    macro_boxes = None
+    if macro_future is not None:
+        macro_results, macro_s = macro_future.result()
+        timings["macro"] = macro_s * 1000.0
+        macro_boxes = boxes_from_results(macro_results, scale, pad, img.shape)
+
+    timings["total"] = (time.perf_counter() - start) * 1000.0
+    return {
+        "micro": boxes_from_results(micro_results, scale, pad, img.shape),
+        "macro": macro_boxes,
+        "timings_ms": timings,
+    }
@@ -0,0 +1,259 @@
+"""
+Flat, memory-mapped checkpoint format (safetensors layout).
+
+File layout:
+    [8 bytes]  little-endian u64 header length N
+    [N bytes]  JSON header {name: {dtype, shape, data_offsets}, "__metadata__": {...}}
+    [rest]     raw tensor bytes, offsets relative to the end of the header
+
+Loading maps the file with mmap and builds tensors directly on top of it, so
+nothing is unpickled and pages are only read when a tensor is touched.
+
+Usage:
+    python checkpoint.py convert ../ml_model/microplastic_cnn.pth
+    python checkpoint.py bench ../ml_model/microplastic_cnn.pth
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import argparse
+import subprocess
+
+import torch
+
+SUFFIX = ".safetensors"
+ALIGNMENT = 8
+
+# ===================== DTYPES =====================
+DTYPE_TO_STR = {
+    torch.float64: "F64",
+    torch.float32: "F32",
+    torch.float16: "F16",
+    torch.bfloat16: "BF16",
+    torch.int64: "I64",
+    torch.int32: "I32",
+    torch.int16: "I16",
+    torch.int8: "I8",
+    torch.uint8: "U8",
+    torch.bool: "BOOL",
+}
+STR_TO_DTYPE = {v: k for k, v in DTYPE_TO_STR.items()}
+
+
+# ===================== SAVE =====================
+def save_file(state_dict, path, metadata=None):
+    """Write a flat {name: tensor} dict to `path`."""
+    header = {}
+    chunks = []
+    offset = 0
+
+    for name, tensor in state_dict.items():
+        if not isinstance(tensor, torch.Tensor):
+            raise TypeError(f"{name}: expected a tensor, got {type(tensor).__name__}")
+        if tensor.dtype not in DTYPE_TO_STR:
+            raise TypeError(f"{name}: unsupported dtype {tensor.dtype}")
+
+        t = tensor.detach().to("cpu").contiguous()
+        data = t.reshape(-1).view(torch.uint8).numpy().tobytes()
+        header[name] = {
+            "dtype": DTYPE_TO_STR[t.dtype],
+            "shape": list(t.shape),
+            "data_offsets": [offset, offset + len(data)],
+        }
+        chunks.append(data)
+        offset += len(data)
+
+    if metadata:
+        header["__metadata__"] = {str(k): str(v) for k, v in metadata.items()}
+
+    raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    # Pad with spaces so the data section starts aligned
+    raw += b" " * (-(8 + len(raw)) % ALIGNMENT)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        for data in chunks:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+# ===================== LOAD =====================
+def read_header(path):
+    with open(path, "rb") as f:
+        # Checked before unpacking: an empty file would otherwise surface as struct.error
+        size = os.fstat(f.fileno()).st_size
+        if size < 8:
+            raise ValueError(f"Empty checkpoint: {path}")
+        (n,) = struct.unpack("<Q", f.read(8))
+        if 8 + n > size:
+            raise ValueError(f"Truncated checkpoint header: {path}")
+        header = json.loads(f.read(n))
+    return header, 8 + n
+
+
+def load_file(path):
+    """
+    Map `path` and return {name: tensor} views over the mapping.
+    The mapping is copy-on-write: untouched pages are never read and
+    pages shared between processes stay in the page cache once.
+    """
+    header, data_start = read_header(path)
+    header.pop("__metadata__", None)
+
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    tensors = {}
+    for name, info in header.items():
+        dtype = STR_TO_DTYPE[info["dtype"]]
+        begin, end = info["data_offsets"]
+        shape = info["shape"]
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+
+        if count == 0:
+            tensors[name] = torch.empty(shape, dtype=dtype)
+            continue
+
+        flat = torch.frombuffer(mm, dtype=dtype, count=count, offset=data_start + begin)
+        tensors[name] = flat.view(shape)
+
+    return tensors
+
+
+def resolve(path):
+    """Prefer the flat sibling of a .pth/.pt file when it exists."""
+    if path.endswith(SUFFIX):
+        return path
+    flat = os.path.splitext(path)[0] + SUFFIX
+    return flat if os.path.isfile(flat) else path
+
+
+def load_state_dict(model, path, device="cpu"):
+    """
+    Load weights into `model` from a flat checkpoint, falling back to a
+    weights-only torch.load for legacy .pth files.
+    """
+    path = resolve(path)
+
+    if path.endswith(SUFFIX):
+        state = load_file(path)
+        # assign=True keeps the mmap-backed tensors instead of copying them
+        model.load_state_dict(state, assign=True)
+    else:
+        state = torch.load(path, map_location="cpu", weights_only=True)
+        model.load_state_dict(state)
+
+    return model.to(device)
+
+
+# ===================== CONVERT =====================
+def convert(src, dst=None, unsafe=False):
+    dst = dst or os.path.splitext(src)[0] + SUFFIX
+
+    # Legacy checkpoints may carry pickled objects; only unpickle them when asked
+    state = torch.load(src, map_location="cpu", weights_only=not unsafe)
+    if isinstance(state, dict) and "state_dict" in state:
+        state = state["state_dict"]
+    if isinstance(state, torch.nn.Module):
+        state = state.state_dict()
+
+    save_file(state, dst, metadata={"source": os.path.basename(src), "format": "pt"})
+    return dst
+
+
+# ===================== BENCHMARK =====================
+def _build_resnet():
+    import torch.nn as nn
+    from torchvision import models
+
+    model = models.resnet18(weights=None)
+    model.fc = nn.Linear(model.fc.in_features, 2)
+    return model
+
+
+def _load_once(path):
+    """Child process: load one checkpoint and report time + peak RSS."""
+    import resource  # Unix-only; kept out of module scope so the server imports on Windows
+
+    model = _build_resnet()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if path.endswith(SUFFIX):
+        model.load_state_dict(load_file(path), assign=True)
+    else:
+        model.load_state_dict(torch.load(path, map_location="cpu", weights_only=False))
+    model.eval()
+    elapsed = time.perf_counter() - start
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "seconds": elapsed,
+        "rss_delta_kb": rss_after - rss_before,
+    }))
+
+
+def bench(pth_path, runs=5):
+    flat_path = os.path.splitext(pth_path)[0] + SUFFIX
+    if not os.path.isfile(flat_path):
+        convert(pth_path, flat_path)
+
+    results = {}
+    for label, path in (("pickle", pth_path), ("mmap", flat_path)):
+        samples = []
+        for _ in range(runs):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "_load", path],
+                capture_output=True, text=True, check=True,
+            )
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+        seconds = sorted(s["seconds"] for s in samples)
+        results[label] = {
+            "median_s": seconds[len(seconds) // 2],
+            "min_s": seconds[0],
+            "rss_delta_kb": max(s["rss_delta_kb"] for s in samples),
+        }
+        print(f"{label:>6}: median {results[label]['median_s'] * 1000:.1f} ms | "
+              f"min {results[label]['min_s'] * 1000:.1f} ms | "
+              f"peak RSS +{results[label]['rss_delta_kb'] / 1024:.1f} MB")
+
+    return results
+
+
+# ===================== CLI =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_convert = sub.add_parser("convert", help="convert .pth files to the flat format")
+    p_convert.add_argument("src", nargs="+")
+    p_convert.add_argument("--unsafe", action="store_true",
+                           help="allow full pickle loading for legacy checkpoints")
+
+    p_bench = sub.add_parser("bench", help="compare startup cost of .pth vs flat loading")
+    p_bench.add_argument("pth")
+    p_bench.add_argument("--runs", type=int, default=5)
+
+    p_load = sub.add_parser("_load")
+    p_load.add_argument("path")
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "convert":
+        for src in args.src:
+            dst = convert(src, unsafe=args.unsafe)
+            print(f"✅ {src} → {dst}")
+    elif args.cmd == "bench":
+        bench(args.pth, runs=args.runs)
+    elif args.cmd == "_load":
+        _load_once(args.path)
+
+
+if __name__ == "__main__":
+    main()
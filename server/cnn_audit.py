@@ -0,0 +1,67 @@
+"""
+ResNet18 plastic / not-plastic classifier used to audit YOLO boxes.
+Shared by app.py and the offline tools so the model is built one way.
+"""
+import os
+import logging
+
+import cv2
+import torch
+import torch.nn as nn
+from torchvision import models, transforms
+from PIL import Image
+
+import checkpoint
+
+log = logging.getLogger("nivora.cnn")
+
+CNN_INPUT_SIZE = 128
+
+cnn_tf = transforms.Compose([
+    transforms.Resize((CNN_INPUT_SIZE, CNN_INPUT_SIZE)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.5]*3, std=[0.5]*3)
+])
+
+
+def load_cnn(path, device):
+    """Return the eval-mode classifier, or None when no checkpoint exists."""
+    if not os.path.isfile(checkpoint.resolve(path)):
+        return None
+
+    model = models.resnet18(weights=None)
+    model.fc = nn.Linear(model.fc.in_features, 2)
+    checkpoint.load_state_dict(model, path, device)
+    model.eval()
+    log.info("✅ CNN auditor loaded (%s)", os.path.basename(checkpoint.resolve(path)))
+    return model
+
+
+def score_rois(model, rois_bgr, device):
+    """Probability of 'plastic' for each BGR crop, in one forward pass."""
+    if not rois_bgr:
+        return []
+
+    batch = torch.stack([
+        cnn_tf(Image.fromarray(cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)))
+        for roi in rois_bgr
+    ]).to(device)
+
+    with torch.no_grad():
+        probs = torch.softmax(model(batch), dim=1)[:, 1]
+    return probs.tolist()
+
+
+def score_frame(model, img_bgr, device, size=CNN_INPUT_SIZE):
+    """
+    Whole-frame 'plastic present' score at low resolution, used as a cheap
+    pre-gate before YOLO. Skips PIL: one area resize + normalise in torch.
+    """
+    small = cv2.resize(img_bgr, (size, size), interpolation=cv2.INTER_AREA)
+    small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+    tensor = torch.from_numpy(small).to(device).permute(2, 0, 1).unsqueeze(0).float()
+    tensor = tensor.div_(127.5).sub_(1.0)  # == Normalize(mean=0.5, std=0.5) on [0, 1]
+
+    with torch.no_grad():
+        return float(torch.softmax(model(tensor), dim=1)[0, 1])
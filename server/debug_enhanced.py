@@ -1,9 +1,10 @@
 import cv2
-import numpy as np
 from ultralytics import YOLO
 import sys
 import os
 
+from enhance import enhance
+
 def debug_enhanced(img_path, model_path):
     print(f"🧪 Testing ENHANCED {img_path} with {model_path}")
     if not os.path.exists(model_path):
@@ -15,20 +16,11 @@ def debug_enhanced(img_path, model_path):
         print("❌ Image load failed")
         return
 
-    # --- ENHANCEMENT ---
-    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l_channel, a, b = cv2.split(lab)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    cl = clahe.apply(l_channel)
-    limg = cv2.merge((cl, a, b))
-    enhanced = cv2.cvtColor(limg, cv2.COLOR_LAB2BGR)
-    gaussian_blur = cv2.GaussianBlur(enhanced, (0, 0), 3)
-    enhanced = cv2.addWeighted(enhanced, 1.5, gaussian_blur, -0.5, 0)
-    
-    cv2.imwrite("debug_enhanced.jpg", enhanced)
+    # --- ENHANCEMENT (same in-memory stage as the server's ENHANCE_INPUT) ---
+    enhanced = enhance(img)
     
     model = YOLO(model_path)
-    results = model("debug_enhanced.jpg", conf=0.001, verbose=False)
+    results = model(enhanced, conf=0.001, verbose=False)
     
     names = model.names
     for r in results:
@@ -0,0 +1,65 @@
+"""
+In-memory contrast enhancement before YOLO (CLAHE on LAB L + unsharp mask).
+
+Same recipe as debug_enhanced.py, without the round trip through disk.
+Every OpenCV call writes into buffers preallocated per frame shape, and
+the CLAHE instance is created once. State is per thread because neither
+the buffers nor cv2.CLAHE can be shared between concurrent requests.
+The returned image is owned by the enhancer: it is overwritten by the
+next call on the same thread.
+"""
+import threading
+
+import cv2
+import numpy as np
+
+
+class _Buffers:
+    def __init__(self, shape):
+        h, w = shape[:2]
+        self.lab = np.empty((h, w, 3), dtype=np.uint8)
+        self.l_in = np.empty((h, w), dtype=np.uint8)
+        self.l_out = np.empty((h, w), dtype=np.uint8)
+        self.bgr = np.empty((h, w, 3), dtype=np.uint8)
+        self.blur = np.empty((h, w, 3), dtype=np.uint8)
+        self.out = np.empty((h, w, 3), dtype=np.uint8)
+
+
+class Enhancer:
+    def __init__(self, clip_limit=2.0, tile_grid=(8, 8), sigma=3.0, amount=1.5):
+        self.clip_limit = clip_limit
+        self.tile_grid = tile_grid
+        self.sigma = sigma
+        self.amount = amount
+        self._local = threading.local()
+
+    def _state(self, shape):
+        local = self._local
+        if not hasattr(local, "clahe"):
+            local.clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.tile_grid)
+            local.buffers = {}
+        buffers = local.buffers.get(shape[:2])
+        if buffers is None:
+            # Live frames keep one resolution; uploads vary, so cap the cache
+            if len(local.buffers) >= 4:
+                local.buffers.clear()
+            buffers = local.buffers[shape[:2]] = _Buffers(shape)
+        return local.clahe, buffers
+
+    def __call__(self, img_bgr):
+        clahe, b = self._state(img_bgr.shape)
+
+        cv2.cvtColor(img_bgr, cv2.COLOR_BGR2LAB, dst=b.lab)
+        cv2.extractChannel(b.lab, 0, dst=b.l_in)
+        clahe.apply(b.l_in, dst=b.l_out)
+        cv2.insertChannel(b.l_out, b.lab, 0)
+        cv2.cvtColor(b.lab, cv2.COLOR_LAB2BGR, dst=b.bgr)
+
+        # Unsharp mask: amount * img - (amount - 1) * blur
+        cv2.GaussianBlur(b.bgr, (0, 0), self.sigma, dst=b.blur)
+        cv2.addWeighted(b.bgr, self.amount, b.blur, 1.0 - self.amount, 0, dst=b.out)
+        return b.out
+
+
+# Shared default instance
+enhance = Enhancer()
@@ -0,0 +1,154 @@
+"""
+Deduplicating event recorder for the /live pipeline.
+
+A sample sitting under the camera produces the same finding on every frame.
+Each detection frame is compared against the last recorded event by a 64-bit
+dHash of the downscaled grey frame and by box-set overlap; a snapshot,
+history record and status.json are written only when the scene materially
+changes. Recent events are kept in a bounded in-memory ring buffer.
+"""
+import os
+import json
+import time
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+import metrics
+
+HASH_DISTANCE = 10     # dHash bits (of 64) that may differ for the "same" scene
+BOX_SIMILARITY = 0.5   # matched-box fraction below which the scene is "new"
+MATCH_IOU = 0.5
+
+
+def dhash(img_bgr):
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 grey thumbnail."""
+    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY) if img_bgr.ndim == 3 else img_bgr
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def box_similarity(boxes_a, boxes_b, match_iou=MATCH_IOU):
+    """
+    Fraction of boxes in both sets that pair up (greedy, IoU >= match_iou).
+    1.0 = same boxes, 0.0 = nothing in common.
+    """
+    if not boxes_a and not boxes_b:
+        return 1.0
+    if not boxes_a or not boxes_b:
+        return 0.0
+
+    unused = list(boxes_b)
+    matched = 0
+    for a in boxes_a:
+        best, best_iou = None, match_iou
+        for b in unused:
+            overlap = iou(a, b)
+            if overlap >= best_iou:
+                best, best_iou = b, overlap
+        if best is not None:
+            unused.remove(best)
+            matched += 1
+    return 2 * matched / (len(boxes_a) + len(boxes_b))
+
+
+class EventRecorder:
+    def __init__(self, snapshot_dir, status_path, persist, capacity=100,
+                 hash_distance=HASH_DISTANCE, box_similarity=BOX_SIMILARITY):
+        """
+        snapshot_dir: where det_<time>.jpg files go
+        status_path:  status.json, rewritten with the latest event
+        persist:      callable(entry) that appends a history record
+        """
+        self.snapshot_dir = snapshot_dir
+        self.status_path = status_path
+        self.persist = persist
+        self.hash_distance = hash_distance
+        self.box_similarity = box_similarity
+
+        self.events = deque(maxlen=capacity)
+        self.duplicates = 0
+        self._last = None  # (hash, boxes) of the last recorded event
+        self._lock = threading.Lock()
+
+    def is_new(self, frame_hash, boxes):
+        if self._last is None:
+            return True
+        last_hash, last_boxes = self._last
+        return (hamming(frame_hash, last_hash) > self.hash_distance
+                or box_similarity(boxes, last_boxes) < self.box_similarity)
+
+    def observe(self, frame_hash, boxes, jpeg, entry):
+        """
+        Record a detection frame if its scene differs from the last event.
+        `frame_hash` is dhash() of the frame *before* boxes and labels were
+        drawn on it, `jpeg` the already-encoded annotated frame and `entry`
+        the history fields. Returns the event dict, or None for a duplicate.
+        """
+        with self._lock:
+            if not self.is_new(frame_hash, boxes):
+                self.duplicates += 1
+                metrics.LIVE_EVENTS.inc(outcome="duplicate")
+                return None
+            self._last = (frame_hash, list(boxes))
+
+            now = time.time()
+            stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
+            image = self._snapshot_name(stamp)
+            with open(os.path.join(self.snapshot_dir, image), "wb") as f:
+                f.write(bytes(jpeg))
+
+            event = {
+                **entry,
+                "image_url": f"/api/static/{image}",
+                "timestamp": int(now),
+                "time": stamp,
+                "hash": f"{frame_hash:016x}",
+                "source": "live",
+            }
+            self.events.appendleft(event)
+            self._write_status(event, image)
+
+        metrics.LIVE_EVENTS.inc(outcome="recorded")
+        self.persist(event)
+        return event
+
+    def recent(self, limit=None):
+        """Newest first."""
+        with self._lock:
+            events = list(self.events)
+        return events[:limit] if limit else events
+
+    def _snapshot_name(self, stamp):
+        # Several scene changes can land in the same second
+        name, n = f"det_{stamp}.jpg", 1
+        while os.path.exists(os.path.join(self.snapshot_dir, name)):
+            name, n = f"det_{stamp}_{n}.jpg", n + 1
+        return name
+
+    def _write_status(self, event, image):
+        status = {
+            "status": event.get("status", ""),
+            "confidence": event.get("confidence", 0.0),
+            "time": event["time"],
+            "image": image,
+        }
+        tmp = f"{self.status_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(status, f, indent=2)
+        os.replace(tmp, self.status_path)
@@ -1,6 +1,4 @@
-import pandas as pd
+# Kept for main.py and existing habits; the streaming builder lives in report.py
+from report import main
 
-df = pd.read_csv("../reports/report.csv")
-df.to_excel("../reports/Microplastic_Report.xlsx", index=False)
-
-print("Report Generated")
+main()
@@ -6,6 +6,8 @@ from PIL import Image
 import cv2
 import numpy as np
 
+import checkpoint
+
 # -----------------------------
 # PATH & DEVICE
 # -----------------------------
@@ -19,9 +21,7 @@ DEVICE = torch.device("cpu")
 model = models.resnet18(weights=None)
 model.fc = nn.Linear(model.fc.in_features, 2)
 
-state = torch.load(MODEL_PATH, map_location=DEVICE)
-model.load_state_dict(state)
-model.to(DEVICE)
+checkpoint.load_state_dict(model, MODEL_PATH, DEVICE)
 model.eval()
 
 print("✅ ResNet18 Microplastic Model Loaded")
@@ -1,10 +1,33 @@
+import os
+import threading
+
 from ultralytics import YOLO
 import cv2
 
-model = YOLO("../yolo_model/macroplastic.pt")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+
+# Resolved from this file, not the CWD; override with MACRO_MODEL_PATH
+MACRO_MODEL_PATH = os.environ.get(
+    "MACRO_MODEL_PATH", os.path.join(ROOT_DIR, "yolo_model", "macroplastic.pt")
+)
+
+_model = None
+_lock = threading.Lock()
+
+
+def get_model(path=None):
+    """Load the macroplastic model on first use (not at import)."""
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                _model = YOLO(path or MACRO_MODEL_PATH)
+    return _model
+
 
 def macro_frame(frame):
-    res = model(frame)[0]
+    res = get_model()(frame, verbose=False)[0]
     detected = False
     conf = 0.0
 
@@ -1,46 +1,196 @@
 import os
-import subprocess
-import signal
 import sys
+import queue
+import signal
 import time
+import logging
+import threading
 
-print("======================================")
-print(" MICROPLASTIC DETECTION SYSTEM STARTED ")
-print("======================================\n")
+from werkzeug.serving import make_server
 
-try:
-    # ----------------------------
-    # Start live detection process
-    # ----------------------------
-    print("[1] Starting live stream detection...")
-    detect_process = subprocess.Popen(
-        ["python", "stream_detect.py"],
-        cwd=os.path.dirname(__file__)
-    )
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+log = logging.getLogger("nivora.supervisor")
 
-    print("[INFO] Press CTRL + C to stop detection\n")
+HOST = os.environ.get("DETECT_HOST", "127.0.0.1")
+PORT = int(os.environ.get("DETECT_PORT", "5000"))
+REPORT_INTERVAL = float(os.environ.get("REPORT_INTERVAL", "0"))  # seconds, 0 = only at shutdown
+
+MAX_BACKOFF = 30.0
+STABLE_AFTER = 60.0        # a worker that ran this long gets its backoff reset
+MAX_BIND_FAILURES = 5      # consecutive port-bind failures before giving up
+
+# ----------------------------
+# WORKERS
+# ----------------------------
+class BindError(RuntimeError):
+    """The worker could not bind its listening socket."""
+
+
+class DetectionWorker:
+    """Serves stream_detect.py's Flask app on a thread; the model is imported once."""
+    name = "detection"
+
+    def __init__(self, app):
+        self.app = app
+        self._server = None
+
+    def run(self, stop):
+        try:
+            server = make_server(HOST, PORT, self.app, threaded=True)
+        except OSError as e:
+            raise BindError(f"cannot listen on {HOST}:{PORT}: {e}") from e
+
+        self._server = server
+        log.info("[1] Live stream detection on http://%s:%d", HOST, PORT)
+        try:
+            server.serve_forever()
+        finally:
+            # Always release the port, or every restart fails with EADDRINUSE
+            self._server = None
+            server.server_close()
+
+    def stop(self):
+        server = self._server
+        if server is not None:
+            server.shutdown()  # run() closes the socket once serve_forever returns
+
+
+class ReportWorker:
+    """Rebuilds the report every REPORT_INTERVAL seconds; the supervisor flushes it on exit."""
+    name = "report"
+
+    def __init__(self, build):
+        self.build = build
+
+    def run(self, stop):
+        if REPORT_INTERVAL <= 0:
+            stop.wait()
+            return
+        while not stop.wait(REPORT_INTERVAL):
+            self.build()
+
+    def stop(self):
+        pass
+
+# ----------------------------
+# SUPERVISOR
+# ----------------------------
+class Supervisor:
+    def __init__(self, workers):
+        self.workers = {w.name: w for w in workers}
+        self.stop_event = threading.Event()
+        # SimpleQueue.put is reentrant: request_stop() calls it from a signal handler
+        # that may interrupt the main thread inside _exits.get()
+        self._exits = queue.SimpleQueue()
+        self._threads = {}
+        self._failures = {w.name: 0 for w in workers}
+        self._bind_failures = {w.name: 0 for w in workers}
+        self.exit_code = 0
 
-    # Keep main process alive
-    while True:
-        time.sleep(1)
+    def _start(self, worker):
+        def target():
+            error = None
+            started = time.monotonic()
+            try:
+                worker.run(self.stop_event)
+            except BindError as e:
+                error = e
+                log.error("❌ Worker %s: %s", worker.name, e)
+            except Exception as e:
+                error = e
+                log.exception("❌ Worker %s crashed", worker.name)
+            self._exits.put((worker.name, error, time.monotonic() - started))
+
+        t = threading.Thread(target=target, name=f"worker-{worker.name}", daemon=True)
+        self._threads[worker.name] = t
+        t.start()
+
+    def _restart_later(self, name):
+        # Exponential backoff, interruptible by shutdown
+        self._failures[name] += 1
+        delay = min(2 ** (self._failures[name] - 1), MAX_BACKOFF)
+        log.warning("🔁 Restarting %s in %.0fs", name, delay)
+
+        def restart():
+            if not self.stop_event.wait(delay):
+                self._start(self.workers[name])
+        threading.Thread(target=restart, daemon=True).start()
+
+    def request_stop(self, *_):
+        self.stop_event.set()
+        self._exits.put(None)
+
+    def run(self):
+        for worker in self.workers.values():
+            self._start(worker)
+
+        # Block on worker exits / stop requests instead of polling
+        while not self.stop_event.is_set():
+            item = self._exits.get()
+            if item is None or self.stop_event.is_set():
+                break
+            name, error, ran_for = item
+            if error is None and name == "report":
+                continue
+
+            if ran_for >= STABLE_AFTER:
+                self._failures[name] = 0
+            if isinstance(error, BindError):
+                self._bind_failures[name] += 1
+                if self._bind_failures[name] >= MAX_BIND_FAILURES:
+                    log.error("❌ %s could not bind %d times in a row, giving up", name, MAX_BIND_FAILURES)
+                    self.exit_code = 1
+                    break
+            else:
+                self._bind_failures[name] = 0
+            self._restart_later(name)
+
+    def shutdown(self, timeout=10.0):
+        self.stop_event.set()
+        for worker in self.workers.values():
+            worker.stop()
+        for t in self._threads.values():
+            t.join(timeout)
+
+
+def main():
+    print("======================================")
+    print(" MICROPLASTIC DETECTION SYSTEM STARTED ")
+    print("======================================\n")
+
+    # Imported once: the model loads here and is shared across worker restarts
+    import stream_detect
+    from report import build_report, REPORTS_DIR
+
+    def flush_report():
+        return build_report(os.path.join(REPORTS_DIR, "Microplastic_Report.xlsx"), "csv")
+
+    supervisor = Supervisor([DetectionWorker(stream_detect.app), ReportWorker(flush_report)])
+    signal.signal(signal.SIGINT, supervisor.request_stop)
+    signal.signal(signal.SIGTERM, supervisor.request_stop)
+
+    print("[INFO] Press CTRL + C to stop detection\n")
+    supervisor.run()
 
-except KeyboardInterrupt:
     print("\n[2] Stopping detection...")
-    detect_process.send_signal(signal.SIGINT)
-    time.sleep(2)
+    supervisor.shutdown()
 
     # ----------------------------
     # Generate report after stop
     # ----------------------------
     print("[3] Generating report...")
-    subprocess.run(
-        ["python", "generate_report.py"],
-        cwd=os.path.dirname(__file__)
-    )
+    result = flush_report()
 
     print("\n======================================")
-    print(" SYSTEM SHUTDOWN SUCCESSFUL ")
-    print(" Report generated in /reports folder ")
+    print(" SYSTEM SHUTDOWN SUCCESSFUL " if supervisor.exit_code == 0 else " SYSTEM STOPPED AFTER FAILURES ")
+    print(f" Report generated: {result['path']} ")
     print("======================================")
 
-    sys.exit(0)
+    sys.exit(supervisor.exit_code)
+
+
+if __name__ == "__main__":
+    main()
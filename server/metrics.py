@@ -0,0 +1,209 @@
+"""
+Minimal Prometheus-style metrics (no external dependency).
+
+    with span("upload", "yolo"):
+        results = model(img)
+
+Spans feed the `nivora_stage_latency_seconds` histogram, labelled by
+pipeline and stage. `render()` returns the text exposition format served
+at /metrics.
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _fmt_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        return self._values.get(key, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}"
+            for key, v in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts (+Inf last), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                return None
+            return {"sum": series[1], "count": series[2]}
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+
+        lines = []
+        for key, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = ("le", _fmt_value(bound) if bound == float("inf") else repr(bound))
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {total!r}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+# ===================== DEFAULT METRICS =====================
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "nivora_stage_latency_seconds",
+    "Time spent in each pipeline stage",
+    ("pipeline", "stage"),
+)
+REQUESTS = REGISTRY.counter(
+    "nivora_frames_total",
+    "Images or frames processed",
+    ("pipeline",),
+)
+DETECTIONS = REGISTRY.counter(
+    "nivora_detections_total",
+    "Accepted detections",
+    ("pipeline",),
+)
+PREGATE = REGISTRY.counter(
+    "nivora_pregate_frames_total",
+    "Frames seen by the clean-water pre-gate, by outcome (pass/skip)",
+    ("pipeline", "outcome"),
+)
+PREGATE_MISSED = REGISTRY.counter(
+    "nivora_pregate_missed_total",
+    "Shadow mode: frames the pre-gate would skip but YOLO found plastic in",
+    ("pipeline",),
+)
+PREGATE_POSITIVE = REGISTRY.counter(
+    "nivora_pregate_positive_total",
+    "Pre-gated frames YOLO found plastic in (shadow mode: skipped frames included)",
+    ("pipeline",),
+)
+CNN_REJECTS = REGISTRY.counter(
+    "nivora_cnn_rejects_total",
+    "YOLO boxes rejected by the CNN audit",
+    ("pipeline",),
+)
+LIVE_EVENTS = REGISTRY.counter(
+    "nivora_live_events_total",
+    "Live detection frames by recorder outcome (recorded/duplicate)",
+    ("outcome",),
+)
+RECONNECTS = REGISTRY.counter(
+    "nivora_stream_connects_total",
+    "Connection attempts to the live camera stream",
+)
+
+
+@contextmanager
+def span(pipeline, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, pipeline=pipeline, stage=stage)
+
+
+def render():
+    return REGISTRY.render()
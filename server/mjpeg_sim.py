@@ -0,0 +1,196 @@
+"""
+Local MJPEG stand-in for the ESP32-CAM stream.
+
+Serves `/stream` as multipart/x-mixed-replace with the same `frame`
+boundary and per-part headers as esp32_cam/esp32_stream.ino, so the
+server's capture path can be load-tested without the board:
+
+    python mjpeg_sim.py --source samples/ --fps 15 --resolution 320x240 --jitter-ms 20
+    ESP32_STREAM_URL=http://127.0.0.1:8081/stream python app.py
+
+`--disconnect-after N` drops each client after N frames to exercise the
+reconnect path (see the `connect` stage in /metrics).
+"""
+import os
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BOUNDARY = "frame"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+# ===================== FRAME SOURCES =====================
+def encode_frames(images, resolution=None, quality=80):
+    import cv2
+
+    frames = []
+    for img in images:
+        if resolution is not None and (img.shape[1], img.shape[0]) != resolution:
+            img = cv2.resize(img, resolution, interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            frames.append(buf.tobytes())
+    return frames
+
+
+def frames_from_folder(path, resolution=None, quality=80):
+    import cv2
+
+    names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTS))
+    images = (cv2.imread(os.path.join(path, n)) for n in names)
+    return encode_frames((img for img in images if img is not None), resolution, quality)
+
+
+def frames_from_video(path, resolution=None, quality=80, max_frames=300):
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    images = []
+    while len(images) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        images.append(frame)
+    cap.release()
+    return encode_frames(images, resolution, quality)
+
+
+def frames_synthetic(count=60, resolution=(320, 240), quality=80, seed=0):
+    from benchmark import synthetic_images
+
+    w, h = resolution or (320, 240)
+    return encode_frames(synthetic_images(count, size=(h, w), seed=seed), None, quality)
+
+
+def load_frames(source=None, resolution=None, quality=80, max_frames=300, seed=0):
+    """Folder → images, file → video, None → seeded synthetic frames."""
+    if source is None:
+        return frames_synthetic(min(max_frames, 60), resolution, quality, seed)
+    if os.path.isdir(source):
+        return frames_from_folder(source, resolution, quality)
+    return frames_from_video(source, resolution, quality, max_frames)
+
+
+# ===================== SERVER =====================
+class MJPEGServer:
+    def __init__(self, frames, fps=20.0, host="127.0.0.1", port=0,
+                 jitter_ms=0.0, disconnect_after=0, seed=0):
+        """frames: list of encoded JPEG bytes, served round-robin."""
+        if not frames:
+            raise ValueError("MJPEGServer needs at least one frame")
+        self.frames = frames
+        self.fps = fps
+        self.jitter_ms = jitter_ms
+        self.disconnect_after = disconnect_after
+        self.frames_sent = 0
+        self.connections = 0
+        self._rng = random.Random(seed)
+
+        sim = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/stream":
+                    self.send_error(404)
+                    return
+                sim.connections += 1
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.end_headers()
+                try:
+                    sim._stream(self.wfile)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/stream"
+
+    def _stream(self, wfile):
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        next_at = time.perf_counter()
+        i = 0
+        while not self.disconnect_after or i < self.disconnect_after:
+            jpg = self.frames[i % len(self.frames)]
+            wfile.write(
+                f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpg)}\r\n\r\n".encode()
+            )
+            wfile.write(jpg)
+            wfile.write(b"\r\n")
+            wfile.flush()
+            self.frames_sent += 1
+            i += 1
+
+            next_at += interval
+            now = time.perf_counter()
+            if next_at < now:
+                next_at = now  # fell behind: resync instead of bursting
+            # Jitter delays this frame only; the schedule stays nominal so the
+            # average rate is still --fps
+            delay = next_at - now
+            if self.jitter_ms:
+                delay += self._rng.uniform(0, self.jitter_ms) / 1000.0
+            if delay > 0:
+                time.sleep(delay)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mjpeg-sim", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# ===================== CLI =====================
+def _resolution(value):
+    w, h = value.lower().split("x")
+    return int(w), int(h)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake ESP32-CAM MJPEG stream")
+    parser.add_argument("--source", help="folder of images or a video file (default: synthetic frames)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--fps", type=float, default=20.0, help="0 = as fast as the client reads")
+    parser.add_argument("--resolution", type=_resolution, default=None, metavar="WxH",
+                        help="resize frames, e.g. 320x240 (ESP32 QVGA)")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random delay per frame")
+    parser.add_argument("--disconnect-after", type=int, default=0, help="drop clients after N frames")
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    frames = load_frames(args.source, args.resolution, args.quality, args.max_frames, args.seed)
+    sim = MJPEGServer(frames, fps=args.fps, host=args.host, port=args.port,
+                      jitter_ms=args.jitter_ms, disconnect_after=args.disconnect_after, seed=args.seed)
+
+    print(f"📡 Serving {len(frames)} frames at {args.fps:g} FPS on {sim.url}")
+    try:
+        sim.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+        print(f"\n🛑 Stopped after {sim.frames_sent} frames, {sim.connections} connections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Versioned YOLO model registry with hot reload.
+
+A background thread polls the weights file. When it changes (and has stopped
+changing, so half-copied files are ignored) the new weights are loaded and
+warmed up off the request path, then swapped in with a single reference
+assignment. Requests grab `registry.current()` once and use that version
+for their whole lifetime, so a swap never mixes two models in one result.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+from ultralytics import YOLO
+
+log = logging.getLogger("nivora.models")
+
+
+def file_version(path):
+    """Short content hash used as the model version tag."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+class ModelVersion:
+    def __init__(self, version, model, path):
+        self.version = version
+        self.model = model
+        self.path = path
+        self.loaded_at = int(time.time())
+
+    def info(self):
+        return {
+            "version": self.version,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, weights_path, poll_interval=5.0, keep=3, warmup_size=640):
+        self.weights_path = weights_path
+        self.poll_interval = poll_interval
+        self.warmup_size = warmup_size
+
+        self._lock = threading.Lock()
+        self._current = None
+        self._previous = deque(maxlen=keep)
+        self._stat = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- loading ----------
+    def _load(self, path, version=None):
+        version = version or file_version(path)
+        model = YOLO(path)
+
+        # Warm-up: first call pays for fusing layers and allocating buffers
+        dummy = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+        model(dummy, verbose=False)
+
+        return ModelVersion(version, model, path)
+
+    def _swap(self, new):
+        with self._lock:
+            if self._current is not None:
+                if self._current.version == new.version:
+                    return False
+                self._previous.append(self._current)
+            self._current = new
+        return True
+
+    def load_initial(self):
+        self._stat = self._file_stat()
+        self._swap(self._load(self.weights_path))
+        log.info("✅ YOLO loaded (offline) → version %s", self._current.version)
+        return self._current
+
+    def reload(self):
+        """Load the weights file now and switch to it if its content changed."""
+        # Hash first: an unchanged file must not pay for a cold load + warm-up
+        version = file_version(self.weights_path)
+        current = self._current
+        if current is not None and current.version == version:
+            log.debug("YOLO weights unchanged (version %s)", version)
+            return current
+
+        new = self._load(self.weights_path, version)
+        if self._swap(new):
+            log.info("🔁 YOLO hot-reloaded → version %s", new.version)
+        return self.current()
+
+    def rollback(self):
+        with self._lock:
+            if not self._previous:
+                return None
+            self._current = self._previous.pop()
+            log.info("⏪ YOLO rolled back → version %s", self._current.version)
+            return self._current
+
+    # ---------- access ----------
+    def current(self):
+        return self._current
+
+    def versions(self):
+        with self._lock:
+            current = self._current.info() if self._current else None
+            previous = [v.info() for v in reversed(self._previous)]
+        return {"current": current, "previous": previous}
+
+    # ---------- watching ----------
+    def _file_stat(self):
+        try:
+            st = os.stat(self.weights_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _watch(self):
+        pending = None
+        while not self._stop.wait(self.poll_interval):
+            stat = self._file_stat()
+            if stat is None or stat == self._stat:
+                pending = None
+                continue
+
+            # Only reload once the file has been stable for a full interval
+            if stat != pending:
+                pending = stat
+                continue
+
+            pending = None
+            try:
+                self.reload()
+            except Exception as e:
+                # _stat is left alone so the next stable poll retries the load
+                log.warning("⚠️ YOLO reload failed, keeping %s: %s", self._current.version, e)
+                continue
+            self._stat = stat
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,287 @@
+"""
+Streaming report builder.
+
+Records are read in chunks (from the detection CSV log and/or
+history.json), aggregated incrementally and written out row by row, so
+memory stays flat however long the monitoring session was:
+
+    python report.py                          # ../reports/report.csv → Microplastic_Report.xlsx
+    python report.py --source history --format csv
+
+The same builder backs the /api/report endpoint in app.py.
+"""
+import os
+import csv
+import json
+import re
+import time
+import argparse
+import logging
+from datetime import datetime
+
+log = logging.getLogger("nivora.report")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+
+REPORTS_DIR = os.path.join(ROOT_DIR, "reports")
+REPORT_CSV = os.path.join(REPORTS_DIR, "report.csv")
+HISTORY_FILE = os.path.join(BASE_DIR, "history.json")
+
+CHUNK_SIZE = 5000
+CONF_BINS = 10
+
+_EPOCH_RE = re.compile(r"\d+(\.\d+)?")
+
+COLUMNS = ["timestamp", "time", "status", "detections", "confidence", "model_version", "image"]
+
+
+# ===================== SOURCES =====================
+def _parse_time(value):
+    """
+    Epoch seconds from an int/float, ISO string or the YYYYmmdd_HHMMSS stamps
+    in status.json. Returns None for anything unparseable or out of range.
+    """
+    if value in (None, ""):
+        return None
+
+    ts = None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        ts = int(value)
+    else:
+        value = str(value).strip()
+        # Stamps first: float() would accept "20251219_171505" as a PEP 515 literal
+        for fmt in ("%Y%m%d_%H%M%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"):
+            try:
+                return int(datetime.strptime(value, fmt).timestamp())
+            except ValueError:
+                continue
+        if _EPOCH_RE.fullmatch(value):
+            ts = int(float(value))
+
+    if ts is None:
+        return None
+    try:
+        datetime.fromtimestamp(ts)
+    except (OverflowError, OSError, ValueError):
+        return None
+    return ts
+
+
+def normalize(raw):
+    status = raw.get("status") or raw.get("label") or ""
+    conf = raw.get("confidence") or raw.get("conf") or 0.0
+    try:
+        conf = float(conf)
+    except (TypeError, ValueError):
+        conf = 0.0
+
+    detections = raw.get("detections")
+    try:
+        detections = int(detections)
+    except (TypeError, ValueError):
+        # Older logs only carry a label
+        detections = 0 if status.upper() in ("", "CLEAN WATER") else 1
+
+    ts = _parse_time(raw.get("timestamp") or raw.get("time"))
+    return {
+        "timestamp": ts,
+        "time": datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts is not None else "",
+        "status": status,
+        "detections": detections,
+        "confidence": conf,
+        "model_version": raw.get("model_version", ""),
+        "image": raw.get("image_url") or raw.get("image") or "",
+    }
+
+
+def iter_csv_chunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, newline="") as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(normalize(row))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def iter_history_chunks(path, chunk_size=CHUNK_SIZE):
+    # history.json is capped at 50 entries by app.py, so one load is fine
+    with open(path) as f:
+        history = json.load(f)
+    for i in range(0, len(history), chunk_size):
+        yield [normalize(r) for r in history[i:i + chunk_size]]
+
+
+def source_chunks(source, csv_path=REPORT_CSV, history_path=HISTORY_FILE):
+    if source in ("csv", "all") and os.path.isfile(csv_path):
+        yield from iter_csv_chunks(csv_path)
+    if source in ("history", "all") and os.path.isfile(history_path):
+        yield from iter_history_chunks(history_path)
+
+
+# ===================== AGGREGATION =====================
+class ReportSummary:
+    def __init__(self, bins=CONF_BINS):
+        self.bins = bins
+        self.records = 0
+        self.positive = 0
+        self.detections = 0
+        self.by_status = {}
+        self.conf_hist = [0] * bins
+        self.conf_sum = 0.0
+        self.conf_max = 0.0
+        self.per_hour = {}
+        self.first_ts = None
+        self.last_ts = None
+
+    def add(self, rec):
+        self.records += 1
+        self.by_status[rec["status"]] = self.by_status.get(rec["status"], 0) + 1
+        self.detections += rec["detections"]
+
+        if rec["detections"] > 0:
+            self.positive += 1
+            conf = min(max(rec["confidence"], 0.0), 1.0)
+            self.conf_hist[min(int(conf * self.bins), self.bins - 1)] += 1
+            self.conf_sum += conf
+            self.conf_max = max(self.conf_max, conf)
+
+        ts = rec["timestamp"]
+        if ts is not None:
+            hour = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:00")
+            self.per_hour[hour] = self.per_hour.get(hour, 0) + rec["detections"]
+            self.first_ts = ts if self.first_ts is None else min(self.first_ts, ts)
+            self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+
+    def to_dict(self):
+        edges = [round(i / self.bins, 2) for i in range(self.bins + 1)]
+        return {
+            "records": self.records,
+            "positive_records": self.positive,
+            "total_detections": self.detections,
+            "by_status": self.by_status,
+            "mean_confidence": round(self.conf_sum / self.positive, 3) if self.positive else 0.0,
+            "max_confidence": round(self.conf_max, 3),
+            "confidence_histogram": [
+                {"from": edges[i], "to": edges[i + 1], "count": c} for i, c in enumerate(self.conf_hist)
+            ],
+            "detections_per_hour": dict(sorted(self.per_hour.items())),
+            "first_timestamp": self.first_ts,
+            "last_timestamp": self.last_ts,
+        }
+
+    def rows(self):
+        """Summary as (label, value) rows for spreadsheet output."""
+        d = self.to_dict()
+        yield ("Records", d["records"])
+        yield ("Records with detections", d["positive_records"])
+        yield ("Total detections", d["total_detections"])
+        yield ("Mean confidence", d["mean_confidence"])
+        yield ("Max confidence", d["max_confidence"])
+        for status, n in sorted(d["by_status"].items()):
+            yield (f"Status: {status}", n)
+        yield ("", "")
+        yield ("Confidence", "Count")
+        for b in d["confidence_histogram"]:
+            yield (f"{b['from']:.1f}–{b['to']:.1f}", b["count"])
+        yield ("", "")
+        yield ("Hour", "Detections")
+        for hour, n in d["detections_per_hour"].items():
+            yield (hour, n)
+
+
+# ===================== WRITERS =====================
+class _CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "w", newline="")
+        self._w = csv.writer(self._f)
+        self._w.writerow(COLUMNS)
+
+    def write(self, rec):
+        self._w.writerow([rec[c] for c in COLUMNS])
+
+    def close(self, summary):
+        self._f.close()
+        # Summary goes next to the records; CSV has no second sheet
+        with open(os.path.splitext(self.path)[0] + "_summary.csv", "w", newline="") as f:
+            csv.writer(f).writerows(summary.rows())
+
+
+class _XlsxWriter:
+    def __init__(self, path):
+        from openpyxl import Workbook
+
+        self.path = path
+        # write_only streams rows to disk instead of building the sheet in memory
+        self._wb = Workbook(write_only=True)
+        self._records = self._wb.create_sheet("Records")
+        self._records.append(COLUMNS)
+
+    def write(self, rec):
+        self._records.append([rec[c] for c in COLUMNS])
+
+    def close(self, summary):
+        sheet = self._wb.create_sheet("Summary")
+        for row in summary.rows():
+            sheet.append(list(row))
+        self._wb.save(self.path)
+
+
+def build_report(out_path, source="csv", fmt=None, csv_path=REPORT_CSV, history_path=HISTORY_FILE):
+    """Stream records from `source` into `out_path`; returns the summary dict."""
+    fmt = fmt or os.path.splitext(out_path)[1].lstrip(".").lower() or "xlsx"
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+
+    if fmt == "xlsx":
+        try:
+            writer = _XlsxWriter(out_path)
+        except ImportError:
+            out_path = os.path.splitext(out_path)[0] + ".csv"
+            log.warning("⚠️ openpyxl not installed → writing CSV to %s", out_path)
+            writer = _CsvWriter(out_path)
+    else:
+        writer = _CsvWriter(out_path)
+
+    summary = ReportSummary()
+    start = time.perf_counter()
+    for chunk in source_chunks(source, csv_path, history_path):
+        for rec in chunk:
+            summary.add(rec)
+            writer.write(rec)
+    writer.close(summary)
+
+    result = summary.to_dict()
+    result["path"] = writer.path
+    log.info("📄 Report (%d records) written to %s in %.2fs",
+             summary.records, writer.path, time.perf_counter() - start)
+    return result
+
+
+def summarize(source="all", csv_path=REPORT_CSV, history_path=HISTORY_FILE):
+    summary = ReportSummary()
+    for chunk in source_chunks(source, csv_path, history_path):
+        for rec in chunk:
+            summary.add(rec)
+    return summary.to_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a microplastic detection report")
+    parser.add_argument("--source", choices=["csv", "history", "all"], default="csv")
+    parser.add_argument("--csv", default=REPORT_CSV, help="detection log to read")
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args(argv)
+
+    out = args.out or os.path.join(REPORTS_DIR, f"Microplastic_Report.{args.format}")
+    result = build_report(out, args.source, args.format, csv_path=args.csv)
+    print(f"Report Generated → {result['path']} ({result['records']} records)")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Cached static serving for result images.
+
+result_<uuid>.jpg and det_<time>.jpg files are written once and never modified, so they get a
+strong content ETag and an immutable Cache-Control. ?w=<px> serves a
+downscaled variant and WebP is served when the client's Accept allows it.
+Variants are encoded once and kept on disk next to the static folder.
+Shared by the Flask and ASGI apps.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import cv2
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+THUMB_WIDTHS = (128, 256, 512, 1024)   # requested widths snap up to one of these
+IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+MIME = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+}
+
+Asset = namedtuple("Asset", "path etag mimetype cache_control vary")
+
+
+def accepts_webp(accept):
+    """True if the Accept header lists image/webp without q=0."""
+    for part in (accept or "").split(","):
+        media, _, params = part.strip().partition(";")
+        if media.strip() == "image/webp":
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def snap_width(width):
+    """Round a requested width up to the nearest allowed one (bounds the variant count)."""
+    for w in THUMB_WIDTHS:
+        if width <= w:
+            return w
+    return THUMB_WIDTHS[-1]
+
+
+def parse_width(value):
+    """?w= value as a positive int, or None (invalid values are ignored)."""
+    try:
+        width = int(value)
+    except (TypeError, ValueError):
+        return None
+    return width if width > 0 else None
+
+
+def is_immutable(filename):
+    return os.path.basename(filename).startswith(("result_", "det_"))
+
+
+class StaticCache:
+    def __init__(self, root, cache_dir, max_etags=4096):
+        self.root = os.path.realpath(root)
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._etags = OrderedDict()   # path -> (mtime_ns, size, etag)
+        self._max_etags = max_etags
+        self._etag_lock = threading.Lock()
+        self._build_locks = {}
+        self._build_locks_guard = threading.Lock()
+
+    # ---------- paths ----------
+    def source_path(self, filename):
+        """Absolute path of `filename` under root, or None if missing / outside it."""
+        path = os.path.realpath(os.path.join(self.root, filename))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def _variant_path(self, source, width, ext):
+        # Keyed on the full relative path (extension included): foo.jpg / foo.png
+        # and a/b.jpg / a__b.jpg must never share a variant
+        rel = os.path.relpath(source, self.root)
+        key = hashlib.blake2b(rel.encode(), digest_size=8).hexdigest()
+        suffix = f".w{width}" if width else ""
+        return os.path.join(self.cache_dir, f"{os.path.basename(rel)}.{key}{suffix}{ext}")
+
+    # ---------- etags ----------
+    def etag(self, path):
+        """Strong ETag (content hash), memoised on (mtime, size)."""
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+        with self._etag_lock:
+            hit = self._etags.get(path)
+            if hit and hit[:2] == key:
+                self._etags.move_to_end(path)
+                return hit[2]
+
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        tag = h.hexdigest()
+
+        with self._etag_lock:
+            self._etags[path] = (*key, tag)
+            self._etags.move_to_end(path)
+            while len(self._etags) > self._max_etags:
+                self._etags.popitem(last=False)
+        return tag
+
+    # ---------- variants ----------
+    def _lock_for(self, path):
+        with self._build_locks_guard:
+            return self._build_locks.setdefault(path, threading.Lock())
+
+    def _build(self, source, out, width, ext):
+        """Encode a variant once; concurrent requests for the same one wait on a lock."""
+        src_mtime = os.stat(source).st_mtime_ns
+        if os.path.isfile(out) and os.stat(out).st_mtime_ns >= src_mtime:
+            return out
+
+        with self._lock_for(out):
+            if os.path.isfile(out) and os.stat(out).st_mtime_ns >= src_mtime:
+                return out
+
+            img = cv2.imread(source, cv2.IMREAD_COLOR)
+            if img is None:
+                return None
+            h, w = img.shape[:2]
+            if width and width < w:  # never upscale
+                img = cv2.resize(img, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+
+            params = []
+            if ext == ".webp":
+                params = [cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY]
+            elif ext in (".jpg", ".jpeg"):
+                params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+            ok, encoded = cv2.imencode(ext, img, params)
+            if not ok:
+                return None
+
+            tmp = f"{out}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(encoded.tobytes())
+            os.replace(tmp, out)
+            return out
+
+    def resolve(self, filename, width=None, accept=""):
+        """
+        Pick the file to send for a request. Returns an Asset, or None if the
+        file does not exist. Encoding work is done here, so async callers
+        should run this off the event loop.
+        """
+        source = self.source_path(filename)
+        if source is None:
+            return None
+
+        cache_control = IMMUTABLE if is_immutable(filename) else REVALIDATE
+        ext = os.path.splitext(source)[1].lower()
+        if ext not in IMAGE_EXTS:
+            return Asset(source, self.etag(source), None, cache_control, None)
+
+        webp = accepts_webp(accept)
+        out_ext = ".webp" if webp else ext
+        width = snap_width(width) if width else None
+
+        path = source
+        if width or webp:
+            path = self._build(source, self._variant_path(source, width, out_ext), width, out_ext) or source
+        return Asset(path, self.etag(path), MIME.get(os.path.splitext(path)[1]), cache_control, "Accept")
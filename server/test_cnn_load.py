@@ -1,16 +1,17 @@
-import torch
 import torch.nn as nn
 from torchvision import models
 
+import checkpoint
+
 def test_load():
     model = models.resnet18(weights=None)
     model.fc = nn.Linear(model.fc.in_features, 2)
     
     path = '../ml_model/microplastic_cnn.pth'
     try:
-        model.load_state_dict(torch.load(path, map_location='cpu'))
+        checkpoint.load_state_dict(model, path, 'cpu')
         model.eval()
-        print("✅ CNN Model loaded successfully (ResNet18 architecture)")
+        print(f"✅ CNN Model loaded successfully (ResNet18 architecture, {checkpoint.resolve(path)})")
     except Exception as e:
         print(f"❌ Failed to load CNN model: {e}")
 
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import report
+
+
+def test_normalize_status_stamp():
+    rec = report.normalize({"time": "20251219_171505", "label": "MICROPLASTIC", "conf": "0.87"})
+    assert rec["timestamp"] == int(datetime(2025, 12, 19, 17, 15, 5).timestamp())
+    assert rec["time"] == "2025-12-19 17:15:05"
+    assert rec["detections"] == 1
+    assert rec["confidence"] == 0.87
+
+
+def test_normalize_epoch_and_garbage():
+    assert report.normalize({"timestamp": 1700000000})["timestamp"] == 1700000000
+    assert report.normalize({"timestamp": "1700000000.5"})["timestamp"] == 1700000000
+    assert report.normalize({"timestamp": "1_700_000_000"})["timestamp"] is None
+    assert report.normalize({"timestamp": "99999999999999999999"})["timestamp"] is None
+    assert report.normalize({"time": "not a time"})["time"] == ""
+
+
+def test_summarize_csv_with_stamps(tmp_path):
+    path = tmp_path / "report.csv"
+    path.write_text("time,label,conf\n20251219_171505,MICROPLASTIC,0.87\n,Clean Water,0\n")
+
+    summary = report.summarize("csv", csv_path=str(path), history_path=str(tmp_path / "none.json"))
+    assert summary["records"] == 2
+    assert summary["positive_records"] == 1
+    assert summary["detections_per_hour"] == {"2025-12-19 17:00": 1}
+    assert summary["first_timestamp"] == summary["last_timestamp"]
+
+
+def test_summary_histogram():
+    summary = report.ReportSummary(bins=10)
+    for conf in (0.05, 0.95, 1.0):
+        summary.add(report.normalize({"status": "Microplastics Detected", "detections": 1, "confidence": conf}))
+    counts = [b["count"] for b in summary.to_dict()["confidence_histogram"]]
+    assert counts[0] == 1 and counts[-1] == 2
+    assert summary.to_dict()["max_confidence"] == 1.0
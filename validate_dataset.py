@@ -0,0 +1,192 @@
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+# =========================
+# CONFIG
+# =========================
+
+BASE = "datasets/underwater_plastic"
+SPLITS = ["train", "valid"]
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# =========================
+# INDEXING (one scandir per directory)
+# =========================
+
+def index_dir(path, exts=None):
+    """Return {stem: filename} for the files in `path` (one directory listing)."""
+    index = {}
+    duplicates = []
+    if not os.path.isdir(path):
+        return index, duplicates
+
+    with os.scandir(path) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+            stem, ext = os.path.splitext(entry.name)
+            if exts is not None and ext.lower() not in exts:
+                continue
+            if stem in index:
+                duplicates.append(entry.name)
+                continue
+            index[stem] = entry.name
+    return index, duplicates
+
+# =========================
+# CHECKS
+# =========================
+
+def check_image(path):
+    """Runs in a worker process. Returns an error string or None."""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as img:
+            img.verify()
+        # verify() does not decode pixel data; load() catches truncated files
+        with Image.open(path) as img:
+            img.load()
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def check_label(path):
+    """Return (num_boxes, [problems]) for a YOLO label file."""
+    problems = []
+    boxes = 0
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) != 5:
+                problems.append(f"line {lineno}: expected 5 fields, got {len(parts)}")
+                continue
+            try:
+                cls = int(parts[0])
+                x, y, w, h = map(float, parts[1:])
+            except ValueError:
+                problems.append(f"line {lineno}: not numeric")
+                continue
+            if cls < 0:
+                problems.append(f"line {lineno}: negative class {cls}")
+            if not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0):
+                problems.append(f"line {lineno}: center ({x}, {y}) outside [0, 1]")
+            if not (0.0 < w <= 1.0 and 0.0 < h <= 1.0):
+                problems.append(f"line {lineno}: size ({w}, {h}) outside (0, 1]")
+            boxes += 1
+    return boxes, problems
+
+
+def validate_split(base, split, pool=None, check_images=True):
+    img_dir = os.path.join(base, split, "images")
+    lbl_dir = os.path.join(base, split, "labels")
+
+    images, dup_images = index_dir(img_dir, IMAGE_EXTS)
+    labels, _ = index_dir(lbl_dir, {".txt"})
+
+    report = {
+        "split": split,
+        "images": len(images),
+        "labels": len(labels),
+        "duplicate_image_stems": dup_images,
+        "orphan_labels": sorted(labels[s] for s in labels.keys() - images.keys()),
+        "unlabeled_images": sorted(images[s] for s in images.keys() - labels.keys()),
+        "empty_labels": [],
+        "bad_labels": {},
+        "corrupt_images": {},
+    }
+
+    for stem in sorted(labels.keys() & images.keys()):
+        boxes, problems = check_label(os.path.join(lbl_dir, labels[stem]))
+        if problems:
+            report["bad_labels"][labels[stem]] = problems
+        elif boxes == 0:
+            report["empty_labels"].append(labels[stem])
+
+    if check_images and images:
+        names = sorted(images.values())
+        paths = [os.path.join(img_dir, n) for n in names]
+        results = pool.map(check_image, paths, chunksize=32) if pool else map(check_image, paths)
+        for name, err in zip(names, results):
+            if err:
+                report["corrupt_images"][name] = err
+
+    return report
+
+# =========================
+# FIXES (only with --fix)
+# =========================
+
+def apply_fixes(base, report, remove_corrupt=False):
+    lbl_dir = os.path.join(base, report["split"], "labels")
+    img_dir = os.path.join(base, report["split"], "images")
+    removed = 0
+
+    for name in report["orphan_labels"]:
+        os.remove(os.path.join(lbl_dir, name))
+        removed += 1
+
+    if remove_corrupt:
+        for name in report["corrupt_images"]:
+            os.remove(os.path.join(img_dir, name))
+            label = os.path.join(lbl_dir, os.path.splitext(name)[0] + ".txt")
+            if os.path.exists(label):
+                os.remove(label)
+            removed += 1
+
+    return removed
+
+
+def summarize(report):
+    return (
+        f"{report['split']}: {report['images']} images, {report['labels']} labels | "
+        f"orphan labels {len(report['orphan_labels'])}, "
+        f"unlabeled images {len(report['unlabeled_images'])}, "
+        f"bad labels {len(report['bad_labels'])}, "
+        f"empty labels {len(report['empty_labels'])}, "
+        f"corrupt images {len(report['corrupt_images'])}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate a YOLO dataset (dry run unless --fix)")
+    parser.add_argument("--base", default=BASE)
+    parser.add_argument("--splits", nargs="+", default=SPLITS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--skip-images", action="store_true", help="do not decode images")
+    parser.add_argument("--report", help="write the full report as JSON")
+    parser.add_argument("--fix", action="store_true", help="delete labels that have no image")
+    parser.add_argument("--remove-corrupt", action="store_true",
+                        help="with --fix, also delete undecodable images and their labels")
+    args = parser.parse_args(argv)
+
+    reports = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for split in args.splits:
+            report = validate_split(args.base, split, pool, check_images=not args.skip_images)
+            reports.append(report)
+            print(f"🔎 {summarize(report)}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"📄 Report written to {args.report}")
+
+    if args.fix:
+        for report in reports:
+            removed = apply_fixes(args.base, report, args.remove_corrupt)
+            print(f"✅ {report['split']}: removed {removed} files")
+    else:
+        print("ℹ️  Dry run: no files changed (use --fix to remove orphan labels)")
+
+    return reports
+
+
+if __name__ == "__main__":
+    main()